@@ -21,9 +21,25 @@ from __future__ import with_statement
 from .loader import (
     load_config,
     load_first_found_config,
+    DirectoryConfigSource,
+    EnvConfigSource,
     FileConfigSource,
+    LazyConfigSource,
     LiteralConfigSource,
-    ObjectConfigSource)  # NOQA
+    LoadCache,
+    ObjectConfigSource,
+    ReloadingConfig)  # NOQA
+from .breaker import CircuitBreaker  # NOQA
+from .changes import diff, ConfigDiff  # NOQA
+from .interpolation import Interpolator  # NOQA
+from .parsers import dump_msgpack  # NOQA
+from .refresh import Refresher  # NOQA
+from .schema import (
+    compile_schema,
+    validate,
+    Field,
+    Schema,
+    SchemaError)  # NOQA
 
 
 __version__ = '0.2.2'
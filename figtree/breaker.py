@@ -0,0 +1,100 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import threading
+import time
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+
+
+class CircuitBreaker(object):
+    # after enough failures in a row calls are refused outright until the
+    # reset timeout passes, then a single trial call decides what is next
+    def __init__(self,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        if failure_threshold < 1:
+            raise ValueError('Failure threshold must be at least one')
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened = None
+
+    def __repr__(self):
+        return '{0:s}({1:s}, {2:d})'.format(self.__class__.__name__,
+                                            self.state,
+                                            self._failures)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._expired():
+                return HALF_OPEN
+            return self._state
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def failure_threshold(self):
+        return self._failure_threshold
+
+    @property
+    def reset_timeout(self):
+        return self._reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._expired():
+                # let exactly one call through to try the waters
+                self._state = HALF_OPEN
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened = None
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or\
+                    self._failures >= self._failure_threshold:
+                self._state = OPEN
+                self._opened = time.time()
+
+    def reset(self):
+        self.success()
+
+    def _expired(self):
+        return time.time() - self._opened >= self._reset_timeout
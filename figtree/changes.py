@@ -0,0 +1,113 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+
+import six
+
+from .dictconfig import DictConfiguration, fingerprint
+
+
+class ConfigDiff(collections.namedtuple('ConfigDiff',
+                                        ['added', 'removed', 'changed'])):
+    __slots__ = ()
+
+    @property
+    def paths(self):
+        return sorted(self.added + self.removed + self.changed)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+
+def diff(old, new):
+    if old is None:
+        old = {}
+    if new is None:
+        new = {}
+    if not isinstance(old, collections.Mapping) or\
+            not isinstance(new, collections.Mapping):
+        raise ValueError('Cannot diff non-mapping type')
+
+    # subtrees shared by both sides or with equal fingerprints are skipped
+    # without being compared
+    # pylint: disable=W0212
+    old = DictConfiguration._make_dict_config(old, recurse=False)
+    new = DictConfiguration._make_dict_config(new, recurse=False)
+
+    added = []
+    removed = []
+    changed = []
+
+    # queue instead of recursion, only subtrees that differ are entered
+    remaining = collections.deque()
+    remaining.append(((), old, new))
+
+    while True:
+        try:
+            path, old_node, new_node = remaining.popleft()
+        except IndexError:
+            break
+
+        old_store = _store(old_node)
+        new_store = _store(new_node)
+
+        for k in old_store:
+            if k not in new_store:
+                removed.append(_join(path, k))
+
+        for k, new_value in six.iteritems(new_store):
+            if k not in old_store:
+                added.append(_join(path, k))
+                continue
+
+            old_value = old_store[k]
+            if old_value is new_value:
+                continue
+
+            old_mapping = isinstance(old_value, collections.Mapping)
+            new_mapping = isinstance(new_value, collections.Mapping)
+            if old_mapping and new_mapping:
+                # nodes cache their digests, identical subtrees cost one
+                # compare, plain mappings are cheaper to walk than to digest
+                if isinstance(old_value, DictConfiguration) and\
+                        isinstance(new_value, DictConfiguration) and\
+                        fingerprint(old_value) == fingerprint(new_value):
+                    continue
+                remaining.append((path + (k, ), old_value, new_value))
+            elif old_mapping or new_mapping or old_value != new_value:
+                changed.append(_join(path, k))
+
+    return ConfigDiff(sorted(added), sorted(removed), sorted(changed))
+
+
+def _store(node):
+    if isinstance(node, DictConfiguration):
+        # pylint: disable=W0212
+        if node._lazy is not None:
+            node._lazy.resolve(node)
+        return node._internal_store
+    return node
+
+
+def _join(path, key):
+    return '.'.join(path + (six.text_type(key), ))
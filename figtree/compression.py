@@ -0,0 +1,100 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import gzip
+import io
+import os.path
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP = 'gzip'
+XZ = 'xz'
+ZSTD = 'zstd'
+
+COMPRESSION_EXTENSIONS = {
+    'gz': GZIP,
+    'gzip': GZIP,
+    'xz': XZ,
+    'zst': ZSTD,
+    'zstd': ZSTD
+}
+
+COMPRESSION_MIME_TYPES = {
+    'application/gzip': GZIP,
+    'application/x-gzip': GZIP,
+    'application/x-xz': XZ,
+    'application/zstd': ZSTD
+}
+
+# compressed content sent with a content encoding is decoded by requests
+ACCEPT_ENCODING = 'gzip, deflate'
+
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', GZIP),
+    (b'\xfd7zXZ\x00', XZ),
+    (b'\x28\xb5\x2f\xfd', ZSTD)
+)
+
+MAGIC_LENGTH = max(len(x) for x, _ in MAGIC_NUMBERS)
+
+
+def split_compression(path):
+    # config.yml.gz -> (config.yml, gzip)
+    root, ext = os.path.splitext(path)
+    compression = COMPRESSION_EXTENSIONS.get(ext[1:].lower(), None)
+    if compression is None:
+        return path, None
+    return root, compression
+
+
+def detect_compression(head):
+    head = bytes(head[:MAGIC_LENGTH])
+    for magic, compression in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_compressed(stream, compression):
+    # a binary stream that decompresses as it is read
+    if compression == GZIP:
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == XZ:
+        if lzma is None:
+            raise ValueError('xz support requires the lzma module')
+        return lzma.LZMAFile(stream, mode='rb')
+    if compression == ZSTD:
+        if zstandard is None:
+            raise ValueError('zstd support requires zstandard')
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(stream))
+    raise ValueError('Unsupported compression {0!r}'.format(compression))
@@ -19,10 +19,48 @@ from __future__ import unicode_literals
 from __future__ import with_statement
 
 import collections
+import copy
+import hashlib
+import itertools
+
 import six
 
+from .query import PathIndex
+from .subscriptions import SubscriptionRegistry
+
+
+# bumped whenever a node is added to, replaced in or removed from any tree
+_GENERATIONS = itertools.count(1)
+
+# leaf values digested as they are, see _canonical
+EXACT_TYPES = frozenset((six.text_type, int, type(None)))
+
+# leaf values that are never changed in place
+SCALAR_TYPES = six.string_types + six.integer_types + (
+    float, bool, bytes, type(None))
+
 
 class DictConfiguration(collections.MutableMapping):
+    # deferred sources still to be merged, only ever set on a root
+    _lazy = None
+    # the node holding this one and the key it is held under, a node placed
+    # in more than one tree reports changes to the last one it joined
+    _parent = None
+    _key = None
+    # cached digest of the content, cleared up the parent chain on every
+    # change
+    _fingerprint = None
+    # change listeners registered on this node
+    _subscriptions = None
+    # key paths below this node, built by the first query
+    _index = None
+    # last structural change anywhere, lets cached lookups revalidate cheaply
+    _generation = 0
+    # read only, shared by everyone holding it
+    _frozen = False
+    # bumped on every write to the store of this node
+    _version = 0
+
     def __init__(self,
                  *args,
                  **kwargs):
@@ -31,6 +69,8 @@ class DictConfiguration(collections.MutableMapping):
 
     def __getitem__(self, key):
         keys = self._parse_key(key)
+        if self._lazy is not None:
+            self._lazy.resolve(self, keys)
 
         context = self._internal_store
         location = []
@@ -51,28 +91,43 @@ class DictConfiguration(collections.MutableMapping):
         return context
 
     def __setitem__(self, key, value):
+        self._check_writable()
         keys = self._parse_key(key)
+        if self._lazy is not None:
+            self._lazy.resolve(self, keys)
 
-        context = self._internal_store
+        context = self
 
+        # walk the stores directly so a single change is reported at the end
         for item in keys[:-1]:
-            child = context.get(item, None)
+            child = context._internal_store.get(item, None)
             if child is None or not isinstance(child, collections.Mapping):
                 child = DictConfiguration()
-                context[item] = child
-            # should be unreachable code
-            # if not isinstance(child, DictConfiguration):
-            #     child = DictConfiguration(child)
-            #     context[item] = child
+                context._attach(item, child)
+            elif not isinstance(child, DictConfiguration):
+                # should be unreachable code
+                child = DictConfiguration(child)
+                context._attach(item, child)
 
             context = child
 
-        context[keys[-1]] = self._maybe_make_dict_config(value)
+        value = self._maybe_make_dict_config(value)
+        if isinstance(value, DictConfiguration) and\
+                value._parent is not None and\
+                (value._parent is not context or value._key != keys[-1]):
+            # a node has a single parent, one that already belongs somewhere
+            # is stored as a copy
+            value = value.copy()
+        context._attach(keys[-1], value)
+        context._changed(keys[-1])
 
     def __delitem__(self, key):
+        self._check_writable()
         keys = self._parse_key(key)
+        if self._lazy is not None:
+            self._lazy.resolve(self, keys)
 
-        context = self._internal_store
+        context = self
         location = []
 
         for item in keys[:-1]:
@@ -83,55 +138,435 @@ class DictConfiguration(collections.MutableMapping):
                 raise KeyError('{0:s} ({1:s}) is not a mapping'.format(
                     '.'.join(location) or '', key))
 
-            context = context.get(item, None)
+            if isinstance(context, DictConfiguration):
+                context = context._internal_store.get(item, None)
+            else:
+                context = context.get(item, None)
 
         if not isinstance(context, collections.Mapping):
             raise KeyError('{0:s} ({1:s}) is not a mapping'.format(
                 '.'.join(location), key))
-        del context[keys[-1]]
+        if not isinstance(context, DictConfiguration):
+            # should be unreachable code
+            del context[keys[-1]]
+            return
+
+        removed = context._internal_store.pop(keys[-1])
+        if isinstance(removed, DictConfiguration):
+            _restructured()
+            if removed._parent is context:
+                removed._parent = None
+                removed._key = None
+        context._changed(keys[-1])
 
     def __iter__(self):
+        if self._lazy is not None:
+            self._lazy.resolve(self)
         return iter(self._internal_store)
 
     def __len__(self):
+        if self._lazy is not None:
+            self._lazy.resolve(self)
         return len(self._internal_store)
 
-    def _parse_key(self, key):
-        result = []
-        if not key:
-            raise KeyError('empty key')
-        if not isinstance(key, six.string_types):
-            raise TypeError('key is not a string')
-
-        keys = key.split('.')
-
-        for item in keys:
-            if not item:
-                raise KeyError('empty key segement in path')
-            result.append(item)
-
-        if not result:
-            raise KeyError('empty key')
+    def update(self, *args, **kwargs):
+        self._check_writable()
+        items = dict(*args, **kwargs)
+        if self._lazy is not None:
+            for k in items:
+                if _is_plain_key(k):
+                    self._lazy.resolve(self, (k, ))
+
+        changed = self._fill(items)
+        # reported once, after every value is in
+        if changed:
+            self._changed_paths(changed)
+
+    def _fill(self, items):
+        # nested plain mappings are built into new nodes before they are
+        # attached, nothing can be watching those yet so only the keys set
+        # on this node are returned to be reported
+        changed = []
+        stack = [(self, iter(list(six.iteritems(items))), None, None)]
+        while stack:
+            node, remaining, parent, key = stack[-1]
+            store = node._internal_store
+            for k, v in remaining:
+                if not _is_plain_key(k):
+                    # dotted and invalid keys expand (or fail) as usual
+                    node[k] = v
+                    continue
+                if isinstance(v, DictConfiguration):
+                    if v._parent is not None:
+                        # a node has a single parent
+                        v = v.copy()
+                elif isinstance(v, collections.Mapping):
+                    stack.append((node._wrap({}), iter(six.iteritems(v)),
+                                  node, k))
+                    break
+
+                if isinstance(v, DictConfiguration) or k in store:
+                    node._attach(k, v)
+                else:
+                    store[k] = v
+                if node is self:
+                    changed.append((k, ))
+            else:
+                stack.pop()
+                if parent is not None:
+                    parent._attach(key, node)
+                    if parent is self:
+                        changed.append((key, ))
+        return changed
 
-        return result
+    def _parse_key(self, key):
+        return _parse_key(key)
 
     def merge(self, other):
+        # nodes of another configuration are merged as copies, a node has a
+        # single parent and the other configuration must keep noticing its
+        # own changes
+        self._merge(other, isinstance(other, DictConfiguration))
+
+    def _merge(self, other, copy_nodes):
+        self._check_writable()
         if not isinstance(other, collections.Mapping):
             raise ValueError('Cannot merge non-mapping type')
 
         other = self._make_dict_config(other)
+        changed = []
 
-        for k, v in six.iteritems(other):
-            if k not in self:
-                self[k] = v
+        remaining = collections.deque()
+        remaining.append(((), self, other))
+
+        while True:
+            try:
+                path, node, incoming = remaining.popleft()
+            except IndexError:
+                break
+
+            for k, v in six.iteritems(incoming):
+                if node is self and self._lazy is not None:
+                    self._lazy.resolve(self, (k, ))
+                current = node._internal_store.get(k, None)
+                if isinstance(current, DictConfiguration) and\
+                        isinstance(v, collections.Mapping):
+                    remaining.append((path + (k, ), current, v))
+                    continue
+
+                if copy_nodes and isinstance(v, DictConfiguration):
+                    v = v.copy()
+                elif copy_nodes and isinstance(v, (list, dict, set)):
+                    v = _copy_value(v)
+                node._attach(k, v)
+                changed.append(path + (k, ))
+
+        # reported once, after the whole mapping is in
+        if changed:
+            self._changed_paths(changed)
+
+    def fingerprint(self):
+        # digest of the content, equal configurations give equal fingerprints
+        # and different ones practically never do, nodes holding lists or
+        # other values that can change in place are digested every time
+        if self._lazy is not None:
+            self._lazy.resolve(self)
+
+        if self._fingerprint is not None:
+            return self._fingerprint
+
+        # post order over nodes without a cached value, no recursion
+        digests = {}
+        stack = [(self, False)]
+        while stack:
+            node, ready = stack.pop()
+            if ready:
+                entries = []
+                volatile = False
+                for k, v in six.iteritems(node._internal_store):
+                    if type(k) is not six.text_type:
+                        k = _canonical(k)[0]
+                    if type(v) in EXACT_TYPES:
+                        entries.append((k, v))
+                    elif isinstance(v, DictConfiguration):
+                        digest = v._fingerprint
+                        if digest is None:
+                            digest = digests[id(v)]
+                            volatile = True
+                        entries.append((k, ('D', digest)))
+                    else:
+                        v, changing = _canonical(v)
+                        volatile = volatile or changing
+                        entries.append((k, v))
+
+                if volatile:
+                    digests[id(node)] = _digest(entries)
+                else:
+                    node._fingerprint = _digest(entries)
                 continue
 
-            this_v = self[k]
-            if isinstance(this_v, collections.Mapping) and\
-                    isinstance(v, collections.Mapping):
-                this_v.merge(v)
+            if node._fingerprint is not None:
+                continue
+            stack.append((node, True))
+            for v in six.itervalues(node._internal_store):
+                if isinstance(v, DictConfiguration) and\
+                        v._fingerprint is None:
+                    stack.append((v, False))
+
+        if self._fingerprint is not None:
+            return self._fingerprint
+        return digests[id(self)]
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, DictConfiguration):
+            return super(DictConfiguration, self).__eq__(other)
+        # digests only match for equal content, and are kept until a change
+        return self.fingerprint() == other.fingerprint()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def _attach(self, key, value):
+        previous = self._internal_store.get(key, None)
+        if isinstance(previous, DictConfiguration) and previous is not value:
+            _restructured()
+            if previous._parent is self:
+                previous._parent = None
+                previous._key = None
+        self._internal_store[key] = value
+        if isinstance(value, DictConfiguration):
+            _restructured()
+            value._parent = self
+            value._key = key
+
+    def get_many(self, keys, defaults=None):
+        # look up several dotted keys at once, keys sharing a parent path only
+        # walk to it once, missing keys give their default (or None)
+        if defaults is None:
+            defaults = {}
+
+        parents = {}
+        result = []
+        for key in keys:
+            path = tuple(_parse_key(key))
+            if self._lazy is not None:
+                self._lazy.resolve(self, path)
+                parents.clear()
+            prefix = path[:-1]
+            try:
+                parent = parents[prefix]
+            except KeyError:
+                parent = self._find(prefix)
+                parents[prefix] = parent
+
+            if parent is None:
+                result.append(defaults.get(key, None))
+                continue
+            try:
+                result.append(parent[path[-1]])
+            except KeyError:
+                result.append(defaults.get(key, None))
+        return result
+
+    def iter_flat(self):
+        for key, _ in self.flat_items():
+            yield key
+
+    def flat_items(self):
+        # (dotted key, leaf) pairs in document order, empty mappings count
+        # as leaves so the result can be turned back into the same tree
+        if self._lazy is not None:
+            self._lazy.resolve(self)
+
+        # a deque as an explicit stack of open mappings, no recursion
+        remaining = collections.deque()
+        remaining.append(('', iter(six.iteritems(self._internal_store))))
+
+        while remaining:
+            prefix, items = remaining[-1]
+            for k, v in items:
+                key = prefix + k
+                if isinstance(v, DictConfiguration):
+                    v = v._internal_store
+                if v and isinstance(v, collections.Mapping):
+                    remaining.append((key + '.', iter(six.iteritems(v))))
+                    break
+                yield key, v
             else:
-                self[k] = v
+                remaining.pop()
+
+    def to_flat_dict(self):
+        return dict(self.flat_items())
+
+    @classmethod
+    def from_flat(cls, items):
+        # build plain dicts in one pass and adopt them as a whole, instead of
+        # going through __setitem__ for every key
+        if isinstance(items, collections.Mapping):
+            items = six.iteritems(items)
+
+        root = {}
+        parents = {}
+        for key, value in items:
+            path = tuple(_parse_key(key))
+            prefix = path[:-1]
+            store = parents.get(prefix, None)
+            if store is None:
+                store = root
+                for item in prefix:
+                    child = store.get(item, None)
+                    if isinstance(child, cls):
+                        child = dict(child._internal_store)
+                        store[item] = child
+                    elif type(child) is not dict:
+                        child = {}
+                        store[item] = child
+                    store = child
+                parents[prefix] = store
+
+            if isinstance(store.get(path[-1], None), collections.Mapping):
+                # anything cached below the replaced value is gone
+                parents.clear()
+            store[path[-1]] = cls._maybe_make_dict_config(value)
+
+        return cls._adopt(root)
+
+    def query(self, pattern):
+        # lazily yields (dotted key, value) for every key matching the glob
+        # style pattern, e.g. services.*.timeout or **.enabled
+        if self._lazy is not None:
+            self._lazy.resolve(self)
+        if self._index is None:
+            self._index = PathIndex(self)
+        return self._index.query(self, pattern)
+
+    def accessor(self, key, default=None):
+        return Accessor(self, key, default=default)
+
+    def _find(self, path):
+        # the store at path or None, without raising along the way
+        context = self._internal_store
+        for item in path:
+            context = context.get(item, None)
+            if isinstance(context, DictConfiguration):
+                context = context._internal_store
+            elif not isinstance(context, collections.Mapping):
+                return None
+        return context
+
+    def subscribe(self, prefix, callback):
+        # callback(config, paths) runs after changes at, above or below the
+        # dotted prefix (relative to this node) with the changed paths
+        if self._subscriptions is None:
+            self._subscriptions = SubscriptionRegistry()
+        return self._subscriptions.subscribe(prefix, callback)
+
+    def transaction(self):
+        # writes are collected on private copies of the nodes they touch and
+        # published all at once when the transaction commits
+        self._check_writable()
+        return Transaction(self)
+
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def freeze(self):
+        # makes the whole tree read only so it can be handed to many readers
+        # at once, leaf lists are not frozen and must be left alone too
+        if self._lazy is not None:
+            self._lazy.resolve(self)
+
+        remaining = collections.deque()
+        remaining.append(self)
+        while True:
+            try:
+                node = remaining.popleft()
+            except IndexError:
+                break
+            node._frozen = True
+            remaining.extend(x for x in six.itervalues(node._internal_store)
+                             if isinstance(x, DictConfiguration))
+        return self
+
+    def _check_writable(self):
+        if self._frozen:
+            raise TypeError('Configuration is frozen, change a copy() of it')
+
+    def _changed(self, key):
+        self._changed_paths([(key, )])
+
+    def _changed_paths(self, paths):
+        listeners = []
+
+        # nodes between this one and the changed paths lose their digests and
+        # only have listeners if they were subscribed to
+        for path in paths:
+            node = self
+            for index, item in enumerate(path[:-1]):
+                node = node._internal_store.get(item, None)
+                if not isinstance(node, DictConfiguration):
+                    break
+                below = [path[index + 1:]]
+                node._fingerprint = None
+                if node._index is not None:
+                    node._index.update(node, below)
+                if node._subscriptions is not None:
+                    listeners.append((node, below))
+            else:
+                # the node whose store was written to
+                node._version += 1
+
+        node = self
+        head = ()
+        while True:
+            node._fingerprint = None
+            if node._index is not None:
+                node._index.update(node, [head + x for x in paths])
+            if node._subscriptions is not None:
+                listeners.append((node, [head + x for x in paths]))
+            if node._parent is None:
+                break
+            head = (node._key, ) + head
+            node = node._parent
+
+        # only notify once the whole chain is consistent again
+        for node, changed in listeners:
+            node._subscriptions.dispatch(node, changed)
+
+    def copy(self):
+        # copies the structure, only immutable leaf values are shared
+        if self._lazy is not None:
+            self._lazy.resolve(self)
+
+        result = self._wrap(dict(self._internal_store))
+        result._fingerprint = self._fingerprint
+
+        remaining = collections.deque()
+        remaining.append(result)
+
+        while True:
+            try:
+                node = remaining.popleft()
+            except IndexError:
+                break
+
+            store = node._internal_store
+            for k, v in six.iteritems(store):
+                if isinstance(v, DictConfiguration):
+                    # pylint: disable=W0212
+                    child = v._wrap(dict(v._internal_store))
+                    child._fingerprint = v._fingerprint
+                    store[k] = child
+                    child._parent = node
+                    child._key = k
+                    remaining.append(child)
+                elif isinstance(v, (list, dict, set)):
+                    store[k] = _copy_value(v)
+
+        return result
 
     @classmethod
     def _make_dict_config(cls, value, recurse=True):
@@ -180,6 +615,59 @@ class DictConfiguration(collections.MutableMapping):
 
         return result
 
+    @classmethod
+    def _adopt(cls, value):
+        # take ownership of freshly decoded data without copying it through
+        # update(), nested plain dicts become the stores of new nodes in place
+        if not isinstance(value, collections.Mapping) or\
+                isinstance(value, cls):
+            return value
+
+        result = cls._wrap(value)
+
+        remaining = collections.deque()
+        remaining.append(result)
+
+        while True:
+            try:
+                node = remaining.popleft()
+            except IndexError:
+                break
+
+            store = node._internal_store
+            unusual = []
+            for k, v in six.iteritems(store):
+                if not _is_plain_key(k):
+                    unusual.append(k)
+                    continue
+                if not isinstance(v, collections.Mapping):
+                    continue
+                if isinstance(v, cls):
+                    v._parent = node
+                    v._key = k
+                    continue
+                # replacing the value of an existing key is safe mid-iteration
+                child = cls._wrap(v)
+                store[k] = child
+                child._parent = node
+                child._key = k
+                remaining.append(child)
+
+            # dotted and invalid keys take the regular path so they expand
+            # (or fail) exactly as they would through update()
+            for k in unusual:
+                node[k] = store.pop(k)
+
+        return result
+
+    @classmethod
+    def _wrap(cls, value):
+        if type(value) is not dict:
+            return cls(value)
+        result = cls.__new__(cls)
+        result._internal_store = value
+        return result
+
     @classmethod
     def _maybe_make_dict_config(cls, value, recurse=True):
         if value is None:
@@ -191,7 +679,345 @@ class DictConfiguration(collections.MutableMapping):
         return cls._make_dict_config(value, recurse=recurse)
 
     def __str__(self):
+        if self._lazy is not None:
+            self._lazy.resolve(self)
         return self._internal_store.__str__()
 
     def __repr__(self):
+        if self._lazy is not None:
+            self._lazy.resolve(self)
         return self._internal_store.__repr__()
+
+
+class Accessor(object):
+    # a precompiled lookup of one dotted key, the node holding the value is
+    # cached until the structure of any configuration changes
+    def __init__(self, config, key, default=None):
+        # config can also be anything that exposes its current configuration
+        # as config, such as a ReloadingConfig
+        self._config = config
+        self._key = key
+        self._path = tuple(_parse_key(key))
+        self._default = default
+        self._root = None
+        self._store = None
+        self._generation = None
+
+    def __repr__(self):
+        return '{0:s}({1!r})'.format(self.__class__.__name__, self._key)
+
+    @property
+    def key(self):
+        return self._key
+
+    def __call__(self):
+        return self.get()
+
+    def get(self, default=None):
+        root = self._config
+        if not isinstance(root, DictConfiguration):
+            root = root.config
+
+        # pylint: disable=W0212
+        if root is not self._root or\
+                self._generation != DictConfiguration._generation or\
+                root._lazy is not None:
+            if root._lazy is not None:
+                root._lazy.resolve(root, self._path)
+            self._generation = DictConfiguration._generation
+            self._store = root._find(self._path[:-1])
+            self._root = root
+
+        if default is None:
+            default = self._default
+        if self._store is None:
+            return default
+        return self._store.get(self._path[-1], default)
+
+
+class Transaction(object):
+    def __init__(self, config):
+        self._config = config
+        # the pending replacement for the store of the config
+        self._store = None
+        # nodes created by this transaction, which may be written in place
+        self._owned = {}
+        # (original node, its copy, version of the original when copied)
+        self._originals = []
+        self._version = None
+        self._changes = []
+        # writes sharing a prefix reuse the node found by the first of them
+        self._parents = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def __getitem__(self, key):
+        keys = self._config._parse_key(key)
+        if self._store is None:
+            return self._config[key]
+
+        context = self._store
+        for index, item in enumerate(keys):
+            if not isinstance(context, collections.Mapping):
+                raise KeyError('{0:s} ({1:s}) is not a mapping'.format(
+                    '.'.join(keys[:index]), key))
+            try:
+                context = context[item]
+            except KeyError:
+                raise KeyError('{0:s} ({1:s})'.format(
+                    '.'.join(keys[:index + 1]), key))
+        return context
+
+    def __setitem__(self, key, value):
+        keys = self._config._parse_key(key)
+        node, store = self._walk(keys, create=True)
+        if isinstance(store.get(keys[-1], None), DictConfiguration):
+            self._parents.clear()
+        self._put(node, store, keys[-1],
+                  self._config._maybe_make_dict_config(value))
+        self._changes.append(tuple(keys))
+
+    def __delitem__(self, key):
+        keys = self._config._parse_key(key)
+        try:
+            _, store = self._walk(keys, create=False)
+            if isinstance(store.pop(keys[-1]), DictConfiguration):
+                self._parents.clear()
+        except KeyError:
+            raise KeyError(key)
+        self._changes.append(tuple(keys))
+
+    def update(self, other=None, **kwargs):
+        if other is not None:
+            if isinstance(other, collections.Mapping):
+                other = six.iteritems(other)
+            for k, v in other:
+                self[k] = v
+        for k, v in six.iteritems(kwargs):
+            self[k] = v
+
+    def commit(self):
+        self._check()
+        self._closed = True
+        if self._store is None:
+            return
+
+        config = self._config
+        # pylint: disable=W0212
+        # writes made straight to what was copied would be undone
+        if config._version != self._version or\
+                any(x._version != v for x, _, v in self._originals):
+            raise RuntimeError(
+                'Configuration changed while the transaction was open')
+
+        for original, replacement, _ in self._originals:
+            replacement._subscriptions = original._subscriptions
+            self._move_children(original,
+                                original._internal_store,
+                                replacement,
+                                replacement._internal_store)
+        self._move_children(config,
+                            config._internal_store,
+                            config,
+                            self._store)
+
+        # a single assignment, readers see either all changes or none
+        config._internal_store = self._store
+        _restructured()
+        config._changed_paths(self._changes)
+
+    def rollback(self):
+        self._check()
+        self._closed = True
+
+    def _check(self):
+        if self._closed:
+            raise RuntimeError('transaction is already closed')
+
+    def _walk(self, keys, create):
+        self._check()
+        config = self._config
+        # pylint: disable=W0212
+        if self._store is None:
+            # deferred sources have to be in place before the store is copied
+            if config._lazy is not None:
+                config._lazy.resolve(config)
+            self._store = dict(config._internal_store)
+            self._version = config._version
+
+        prefix = tuple(keys[:-1])
+        cached = self._parents.get(prefix, None)
+        if cached is not None:
+            return cached
+
+        node = config
+        store = self._store
+        for item in keys[:-1]:
+            child = store.get(item, None)
+            if isinstance(child, DictConfiguration):
+                if id(child) not in self._owned:
+                    # copy on first write, siblings stay shared with the
+                    # original
+                    replacement = child._wrap(dict(child._internal_store))
+                    self._originals.append(
+                        (child, replacement, child._version))
+                    child = replacement
+                    self._own(node, store, item, child)
+            elif isinstance(child, collections.Mapping):
+                # should be unreachable code
+                child = DictConfiguration(child)
+                self._own(node, store, item, child)
+            elif create:
+                child = DictConfiguration()
+                self._own(node, store, item, child)
+            else:
+                raise KeyError(item)
+
+            node = child
+            store = child._internal_store
+
+        self._parents[prefix] = (node, store)
+        return node, store
+
+    def _own(self, node, store, key, child):
+        self._owned[id(child)] = child
+        self._put(node, store, key, child)
+
+    @staticmethod
+    def _put(node, store, key, value):
+        store[key] = value
+        if isinstance(value, DictConfiguration):
+            # pylint: disable=W0212
+            value._parent = node
+            value._key = key
+
+    @staticmethod
+    def _move_children(old_node, old_store, new_node, new_store):
+        # pylint: disable=W0212
+        for k, v in six.iteritems(old_store):
+            if not isinstance(v, DictConfiguration) or\
+                    v._parent is not old_node:
+                continue
+            if new_store.get(k, None) is v:
+                v._parent = new_node
+            else:
+                v._parent = None
+                v._key = None
+
+
+def fingerprint(value):
+    # digest of any value, mappings digest the same as nodes of equal content
+    if isinstance(value, DictConfiguration):
+        return value.fingerprint()
+    value, _ = _canonical(value)
+    if isinstance(value, tuple) and value[0] == 'D':
+        return value[1]
+    return hashlib.sha1(repr(value).encode('utf-8')).digest()
+
+
+def _digest(entries):
+    # entries are canonical (key, value) pairs, ordered by key
+    try:
+        entries.sort()
+    except TypeError:
+        # keys of different types, any fixed order will do
+        entries.sort(key=lambda x: repr(x[0]))
+    return hashlib.sha1(repr(entries).encode('utf-8')).digest()
+
+
+def _canonical(value):
+    # the value in a form whose repr is the same for everything that compares
+    # equal to it and differs otherwise, and whether it can change in place,
+    # containers and other types are tagged so they never pass for another
+    kind = type(value)
+    if kind in EXACT_TYPES:
+        return value, False
+
+    if isinstance(value, (bool, float)):
+        # 1 == 1.0 == True
+        if isinstance(value, bool) or value.is_integer():
+            return int(value), False
+        return float(value), False
+
+    if isinstance(value, six.integer_types):
+        return int(value), False
+
+    if isinstance(value, six.text_type):
+        return value + '', False
+
+    if isinstance(value, six.binary_type):
+        if six.PY2:
+            try:
+                # plain ascii byte strings equal their text on python 2
+                return value.decode('ascii'), False
+            except UnicodeDecodeError:
+                pass
+        return ('b', bytes(value)), False
+
+    if isinstance(value, collections.Mapping):
+        entries = []
+        for k, v in six.iteritems(value):
+            k, _ = _canonical(k)
+            v, _ = _canonical(v)
+            entries.append((k, v))
+        return ('D', _digest(entries)), True
+
+    if isinstance(value, (list, tuple)):
+        items = [_canonical(x) for x in value]
+        volatile = isinstance(value, list) or any(x[1] for x in items)
+        return ('l' if isinstance(value, list) else 't',
+                tuple(x[0] for x in items)), volatile
+
+    if isinstance(value, (set, frozenset)):
+        items = [_canonical(x) for x in value]
+        volatile = isinstance(value, set) or any(x[1] for x in items)
+        return ('S', tuple(sorted(repr(x[0]) for x in items))), volatile
+
+    # anything else by its type and repr, which may change without notice
+    return ('o', kind.__module__, kind.__name__, repr(value)), True
+
+
+def _copy_value(value):
+    # lists of plain values are by far the most common, and a slice copies
+    # them many times faster than deepcopy
+    if isinstance(value, list) and\
+            all(isinstance(x, SCALAR_TYPES) for x in value):
+        return value[:]
+    return copy.deepcopy(value)
+
+
+def _restructured():
+    DictConfiguration._generation = next(_GENERATIONS)
+
+
+def _parse_key(key):
+    result = []
+    if not key:
+        raise KeyError('empty key')
+    if not isinstance(key, six.string_types):
+        raise TypeError('key is not a string')
+
+    keys = key.split('.')
+
+    for item in keys:
+        if not item:
+            raise KeyError('empty key segement in path')
+        result.append(item)
+
+    if not result:
+        raise KeyError('empty key')
+
+    return result
+
+
+def _is_plain_key(key):
+    return isinstance(key, six.string_types) and key and '.' not in key
@@ -0,0 +1,140 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+
+import six
+
+
+# the whole value is wanted
+INCLUDE = 'include'
+# the whole value is unwanted
+EXCLUDE = 'exclude'
+# the value is wanted, but something beneath it is excluded
+PRUNE = 'prune'
+# the value is unwanted, but something beneath it is included
+DESCEND = 'descend'
+
+
+def make_key_filter(include=None, exclude=None):
+    if include is None and not exclude:
+        return None
+    return KeyFilter(include=include, exclude=exclude)
+
+
+class KeyFilter(object):
+    def __init__(self, include=None, exclude=None, within=None):
+        self._include = None
+        if include is not None:
+            self._include = _split_prefixes(include)
+        self._exclude = _split_prefixes(exclude or ())
+        self._within = within
+
+    @property
+    def include(self):
+        if self._include is None:
+            return None
+        return ['.'.join(x) for x in self._include]
+
+    @property
+    def exclude(self):
+        return ['.'.join(x) for x in self._exclude]
+
+    def action(self, path):
+        result = self._action(path)
+        if self._within is None or result == EXCLUDE:
+            return result
+
+        other = self._within.action(path)
+        if result == other or other == EXCLUDE:
+            return other
+        if result == DESCEND or other == DESCEND:
+            return DESCEND
+        return PRUNE
+
+    def keeps_leaf(self, path):
+        return self.action(path) in (INCLUDE, PRUNE)
+
+    def select(self, value, path=()):
+        # build a filtered copy, the value handed in is never modified
+        if not isinstance(value, collections.Mapping):
+            return value
+
+        result = {}
+        for k, v in six.iteritems(value):
+            child_path = path + _split_key(k)
+            action = self.action(child_path)
+            if action == INCLUDE:
+                result[k] = v
+            elif action == EXCLUDE:
+                continue
+            elif isinstance(v, collections.Mapping):
+                selected = self.select(v, child_path)
+                if selected or action == PRUNE:
+                    result[k] = selected
+            elif action == PRUNE:
+                result[k] = v
+        return result
+
+    def _action(self, path):
+        for prefix in self._exclude:
+            if path[:len(prefix)] == prefix:
+                return EXCLUDE
+
+        if self._include is not None:
+            included = False
+            below = False
+            for prefix in self._include:
+                if path[:len(prefix)] == prefix:
+                    included = True
+                    break
+                if prefix[:len(path)] == path:
+                    below = True
+            if not included:
+                return DESCEND if below else EXCLUDE
+
+        for prefix in self._exclude:
+            if prefix[:len(path)] == path:
+                return PRUNE
+
+        return INCLUDE
+
+    def __repr__(self):
+        return '{0:s}(include={1!r}, exclude={2!r})'.format(
+            self.__class__.__name__,
+            self.include,
+            self.exclude)
+
+
+def _split_prefixes(prefixes):
+    if isinstance(prefixes, six.string_types):
+        prefixes = (prefixes, )
+    result = []
+    for prefix in prefixes:
+        if not prefix or not isinstance(prefix, six.string_types):
+            raise ValueError('Invalid key prefix {0!r}'.format(prefix))
+        result.append(tuple(prefix.split('.')))
+    return result
+
+
+def _split_key(key):
+    if isinstance(key, six.string_types):
+        return tuple(key.split('.'))
+    return (key, )
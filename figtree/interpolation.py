@@ -0,0 +1,264 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+import os
+import re
+
+import six
+
+from .dictconfig import DictConfiguration
+
+
+# ${some.key} or ${ENV:NAME}, $${ is a literal ${
+REFERENCE = re.compile(r'\$(\$?)\{([^}]*)\}')
+ENVIRONMENT = 'ENV:'
+
+
+class Interpolator(object):
+    # resolves references in the string values of a configuration and writes
+    # the results back, then keeps them current as the configuration changes
+    def __init__(self, config, environ=None):
+        if not isinstance(config, DictConfiguration):
+            raise ValueError('Cannot interpolate non-configuration type')
+
+        self._config = config
+        self._environ = os.environ if environ is None else environ
+        # path -> parsed template, for every value holding a reference
+        self._templates = {}
+        # referenced path -> paths of the templates referring to it
+        self._dependents = {}
+        self._resolved = {}
+        self._writing = False
+
+        # pylint: disable=W0212
+        if config._lazy is not None:
+            config._lazy.resolve(config)
+
+        self._scan(())
+        self._refresh(list(self._templates))
+        self._subscription = config.subscribe(None, self._changed)
+
+    @property
+    def config(self):
+        return self._config
+
+    def close(self):
+        self._subscription.cancel()
+
+    def _changed(self, config, paths):
+        if self._writing:
+            return
+
+        paths = [tuple(x.split('.')) for x in paths]
+        affected = set()
+        for path in paths:
+            # whatever was at or below the path has been replaced
+            for template in [x for x in self._templates
+                             if x[:len(path)] == path]:
+                self._forget(template)
+                affected.add(template)
+            affected.update(self._scan(path))
+
+            for target, dependents in six.iteritems(self._dependents):
+                if target[:len(path)] == path or path[:len(target)] == target:
+                    affected.update(dependents)
+
+        # and everything that depends on those, directly or not
+        remaining = collections.deque(affected)
+        while remaining:
+            dependents = self._dependents.get(remaining.popleft(), ())
+            for template in dependents:
+                if template not in affected:
+                    affected.add(template)
+                    remaining.append(template)
+
+        self._refresh([x for x in affected if x in self._templates])
+
+    def _refresh(self, paths):
+        for path in paths:
+            self._resolved.pop(path, None)
+
+        updates = []
+        for path in paths:
+            value = self._resolve(path)
+            current = self._lookup(path)
+            if type(current) is not type(value) or current != value:
+                updates.append((path, value))
+
+        if not updates:
+            return
+
+        # one write for all of them, and not reported back to ourselves
+        self._writing = True
+        try:
+            with self._config.transaction() as txn:
+                for path, value in updates:
+                    txn['.'.join(path)] = value
+        finally:
+            self._writing = False
+
+    def _resolve(self, path):
+        # depth first without recursion, a template is rendered once all of
+        # the templates it refers to are
+        resolved = self._resolved
+        visiting = set()
+        stack = [path]
+
+        while stack:
+            current = stack[-1]
+            if current in resolved:
+                stack.pop()
+                continue
+
+            pending = [x for x in self._templates[current].references
+                       if x in self._templates and x not in resolved]
+            if pending and current not in visiting:
+                visiting.add(current)
+                for reference in pending:
+                    if reference in visiting:
+                        raise ValueError(
+                            'Circular reference to {0:s} in {1:s}'.format(
+                                '.'.join(reference), '.'.join(current)))
+                stack.extend(pending)
+                continue
+
+            resolved[current] = self._render(current)
+            visiting.discard(current)
+            stack.pop()
+
+        return resolved[path]
+
+    def _render(self, path):
+        template = self._templates[path]
+
+        values = []
+        for literal, reference, name in template.parts:
+            if literal is not None:
+                values.append(literal)
+            elif name is not None:
+                try:
+                    values.append(self._environ[name])
+                except KeyError:
+                    raise KeyError('Environment variable {0:s} ({1:s})'.format(
+                        name, '.'.join(path)))
+            else:
+                value = self._resolved.get(reference, _NOTHING)
+                if value is _NOTHING:
+                    value = self._lookup(reference)
+                if value is _NOTHING:
+                    raise KeyError('{0:s} ({1:s})'.format(
+                        '.'.join(reference), '.'.join(path)))
+                if isinstance(value, collections.Mapping):
+                    raise ValueError(
+                        'Cannot interpolate mapping {0:s} ({1:s})'.format(
+                            '.'.join(reference), '.'.join(path)))
+                values.append(value)
+
+        # a value that is nothing but a reference keeps its type
+        if len(values) == 1 and template.parts[0][0] is None:
+            return values[0]
+        return ''.join(six.text_type(x) for x in values)
+
+    def _scan(self, path):
+        value = self._lookup(path)
+        if value is _NOTHING:
+            return []
+
+        found = []
+        remaining = collections.deque()
+        remaining.append((path, value))
+        while True:
+            try:
+                path, value = remaining.popleft()
+            except IndexError:
+                break
+
+            if isinstance(value, collections.Mapping):
+                # pylint: disable=W0212
+                store = getattr(value, '_internal_store', value)
+                remaining.extend(
+                    (path + (k, ), v) for k, v in six.iteritems(store)
+                    if isinstance(k, six.string_types))
+            elif isinstance(value, six.string_types) and '${' in value:
+                self._remember(path, _Template(value))
+                found.append(path)
+        return found
+
+    def _remember(self, path, template):
+        self._templates[path] = template
+        for reference in template.references:
+            self._dependents.setdefault(reference, set()).add(path)
+
+    def _forget(self, path):
+        template = self._templates.pop(path)
+        self._resolved.pop(path, None)
+        for reference in template.references:
+            dependents = self._dependents.get(reference, None)
+            if dependents is not None:
+                dependents.discard(path)
+                if not dependents:
+                    del self._dependents[reference]
+
+    def _lookup(self, path):
+        # pylint: disable=W0212
+        value = self._config
+        for item in path:
+            store = getattr(value, '_internal_store', value)
+            if not isinstance(store, collections.Mapping):
+                return _NOTHING
+            value = store.get(item, _NOTHING)
+            if value is _NOTHING:
+                break
+        return value
+
+
+# marks a missing value, None is a perfectly good configuration value
+_NOTHING = object()
+
+
+class _Template(object):
+    __slots__ = ('parts', 'references')
+
+    def __init__(self, text):
+        # (literal, reference path, environment variable name) triples
+        self.parts = []
+        self.references = set()
+
+        position = 0
+        for match in REFERENCE.finditer(text):
+            if match.start() > position:
+                self.parts.append((text[position:match.start()], None, None))
+            position = match.end()
+
+            escaped, name = match.groups()
+            if escaped:
+                self.parts.append(('${' + name + '}', None, None))
+            elif name.startswith(ENVIRONMENT):
+                self.parts.append((None, None, name[len(ENVIRONMENT):]))
+            else:
+                reference = tuple(name.split('.'))
+                if not all(reference):
+                    raise ValueError('Invalid reference {0!r}'.format(name))
+                self.parts.append((None, reference, None))
+                self.references.add(reference)
+
+        if position < len(text):
+            self.parts.append((text[position:], None, None))
@@ -0,0 +1,252 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import codecs
+import re
+
+import six
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from .dictconfig import DictConfiguration
+from .filters import KeyFilter, INCLUDE, EXCLUDE, PRUNE
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# python 2.6 has no memoryview, chunks are sliced copies there
+MEMORYVIEW = getattr(six.moves.builtins, 'memoryview', None)
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# everything up to the next bracket, stepping over complete strings
+SKIPPABLE = re.compile(
+    r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*', re.DOTALL)
+
+
+def load_json_stream(data,
+                     prefixes=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE,
+                     key_filter=None):
+    if prefixes is not None:
+        key_filter = KeyFilter(include=prefixes, within=key_filter)
+    return JsonStreamBuilder(data,
+                             key_filter=key_filter,
+                             chunk_size=chunk_size).build()
+
+
+class JsonStreamBuilder(object):
+    def __init__(self,
+                 data,
+                 key_filter=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self._chunks = _iter_chunks(data, chunk_size or DEFAULT_CHUNK_SIZE)
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self._key_filter = key_filter
+
+    def build(self):
+        if self._peek() != '{':
+            raise ValueError('JSON configuration must be an object')
+        result = self._parse_object(())
+        if self._peek():
+            self._fail('Extra data')
+        return result
+
+    def _parse_object(self, path):
+        self._expect('{')
+        result = DictConfiguration()
+
+        if self._peek() == '}':
+            self._position += 1
+            return result
+
+        while True:
+            if self._peek() != '"':
+                self._fail('Expecting property name')
+            key = self._decode()
+            self._expect(':')
+
+            child_path = path + tuple(key.split('.'))
+            action = INCLUDE
+            if self._key_filter is not None:
+                action = self._key_filter.action(child_path)
+
+            value = None
+            keep = False
+            if action == INCLUDE:
+                value = DictConfiguration._adopt(self._decode())
+                keep = True
+            elif action != EXCLUDE and self._peek() == '{':
+                value = self._parse_object(child_path)
+                # nothing wanted was found under an unwanted key
+                keep = bool(value) or action == PRUNE
+            elif action == PRUNE:
+                value = DictConfiguration._adopt(self._decode())
+                keep = True
+            else:
+                self._skip()
+
+            if keep:
+                # pylint: disable=W0212
+                if key and '.' not in key:
+                    result._attach(key, value)
+                else:
+                    result[key] = value
+
+            separator = self._peek()
+            self._position += 1
+            if separator == '}':
+                return result
+            if separator != ',':
+                self._position -= 1
+                self._fail('Expecting \',\' delimiter')
+
+    def _peek(self):
+        while True:
+            self._position = WHITESPACE.match(self._buffer,
+                                              self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._fill():
+                return ''
+
+    def _expect(self, token):
+        if self._peek() != token:
+            self._fail('Expecting {0!r}'.format(token))
+        self._position += 1
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer,
+                                                      self._position)
+            except ValueError:
+                # might just be cut off at the end of the buffer, read at
+                # least as much again so retries stay linear overall
+                if self._fill(len(self._buffer) - self._position):
+                    continue
+                raise
+
+            # numbers and literals can continue into the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+
+            self._position = end
+            return value
+
+    def _skip(self):
+        if self._peek() not in ('{', '['):
+            # scalars are cheap enough to decode and drop
+            self._decode()
+            return
+
+        depth = 0
+        while True:
+            self._position = SKIPPABLE.match(self._buffer,
+                                             self._position).end()
+            if self._position == len(self._buffer):
+                # nothing of interest, let the scanned text go
+                if not self._fill():
+                    self._fail('Unterminated value')
+                continue
+
+            token = self._buffer[self._position]
+            if token == '"':
+                # a string cut off by the end of the buffer
+                if not self._fill():
+                    self._fail('Unterminated string')
+                continue
+
+            self._position += 1
+            if token in ('{', '['):
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def _fill(self, minimum=1):
+        if self._eof:
+            return False
+
+        pieces = [self._buffer[self._position:]]
+        read = 0
+        while read < max(minimum, 1):
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                break
+            pieces.append(chunk)
+            read += len(chunk)
+
+        self._buffer = ''.join(pieces)
+        self._position = 0
+        return read > 0
+
+    def _fail(self, message):
+        raise ValueError('{0:s}: near {1!r}'.format(
+            message,
+            self._buffer[self._position:self._position + 20]))
+
+
+def _iter_chunks(data, chunk_size):
+    if isinstance(data, six.text_type):
+        for offset in six.moves.range(0, len(data), chunk_size):
+            yield data[offset:offset + chunk_size]
+        return
+
+    if hasattr(data, 'read'):
+        raw = iter(lambda: data.read(chunk_size), data.read(0))
+    else:
+        if MEMORYVIEW is not None:
+            data = MEMORYVIEW(data)
+        raw = (data[offset:offset + chunk_size]
+               for offset in six.moves.range(0, len(data), chunk_size))
+
+    decoder = None
+    for chunk in raw:
+        if isinstance(chunk, six.text_type):
+            yield chunk
+            continue
+        if MEMORYVIEW is not None and isinstance(chunk, MEMORYVIEW):
+            chunk = chunk.tobytes()
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(_detect_encoding(chunk))()
+        yield decoder.decode(chunk)
+
+    if decoder is not None:
+        tail = decoder.decode(b'', True)
+        if tail:
+            yield tail
+
+
+def _detect_encoding(head):
+    if head.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        return 'utf-32'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return 'utf-8-sig'
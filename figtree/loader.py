@@ -20,16 +20,34 @@ from __future__ import with_statement
 
 import os.path
 import abc
+import codecs
 import collections
+import copy
+import glob
 import io
+import itertools
+import mmap
+import multiprocessing
+import threading
+import weakref
+from multiprocessing.pool import ThreadPool
 
 import requests
 
 from six.moves.urllib import parse
 import six
 
-from .dictconfig import DictConfiguration
-from .parsers import Parser
+from .breaker import CircuitBreaker
+from .changes import diff
+from .compression import ACCEPT_ENCODING, COMPRESSION_MIME_TYPES,\
+    MAGIC_LENGTH, detect_compression, open_compressed, split_compression
+from .dictconfig import Accessor, DictConfiguration
+from .filters import make_key_filter, KeyFilter
+from .interpolation import Interpolator
+from .parsers import Parser, _parse_value
+from .schema import compile_schema
+from .singleflight import SingleFlight
+from .subscriptions import SubscriptionRegistry
 
 
 FILE_EXTENSION_HINTS = {
@@ -41,7 +59,11 @@ FILE_EXTENSION_HINTS = {
     'cnf': 'ini',
     'config': 'ini',
     'ini': 'ini',
-    'xml': 'xml'
+    'xml': 'xml',
+    'toml': 'toml',
+    'tml': 'toml',
+    'msgpack': 'msgpack',
+    'mpk': 'msgpack'
 }
 
 MIME_TYPE_HINTS = {
@@ -52,16 +74,45 @@ MIME_TYPE_HINTS = {
     'application/json': 'json',
     'text/plain': 'ini',
     'text/xml': 'xml',
-    'application/xml': 'xml'
+    'application/xml': 'xml',
+    'application/toml': 'toml',
+    'application/x-toml': 'toml',
+    'text/toml': 'toml',
+    'text/x-toml': 'toml',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack'
 }
 
+# load_config results kept by a LoadCache unless told otherwise
+DEFAULT_CACHE_ENTRIES = 128
+
+# URLs whose breaker and last good result are remembered
+MAX_REMOTES = 256
+
+# streamed downloads are read this much at a time
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# longer marks first, the utf-32 marks begin with the utf-16 ones
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+)
+
+MAX_BOM_LENGTH = max(len(x) for x, _ in BYTE_ORDER_MARKS)
+
 
 @six.add_metaclass(abc.ABCMeta)
 class BaseConfigSource(object):
     def __init__(self,
                  source,
-                 hint=None):
+                 hint=None,
+                 parser_options=None):
         self._source = source
+        self._parser_options = dict(parser_options or {})
         self._hint = None
         if hint:
             resolved = FILE_EXTENSION_HINTS.get(hint.lower(), None)
@@ -86,88 +137,381 @@ class BaseConfigSource(object):
     def hint(self):
         return self._hint
 
+    @property
+    def parser_options(self):
+        return self._parser_options
+
+    def exists(self):
+        # cheap check that load() has something to read
+        return True
+
+    def fingerprint(self):
+        # identifies what load() would return without loading it, None when
+        # that cannot be told (and the result is never cached)
+        return None
+
     @abc.abstractmethod
-    def load(self):
+    def load(self, include=None, exclude=None):
         pass
 
+    def _with_options(self, **options):
+        # a copy parsing with more options, this source keeps its own
+        result = copy.copy(self)
+        result._parser_options = dict(self._parser_options, **options)
+        return result
+
 
 class FileConfigSource(BaseConfigSource):
     def __init__(self,
                  source,
                  hint=None,
-                 encoding=None):
+                 encoding=None,
+                 parser_options=None,
+                 session=None,
+                 breaker=None,
+                 serve_stale=True,
+                 stream=False,
+                 max_size=None,
+                 timeout=None):
         # parse the extension if no hint provided
         if not source:
             raise ValueError('Source not provided for file config')
         if source[0] == '@':
             source = source[1:]
         self._encoding = encoding
+        # requests goes through a session when given one (shared connections)
+        self._session = session
+        # failing servers are skipped, serving the last good result instead,
+        # sources for the same URL share a breaker unless given their own
+        self._breaker = breaker
+        self._serve_stale = serve_stale
+        self._stale_hits = 0
+        # bodies are streamed into the parser when asked or bounded, and
+        # timeouts are handed to requests as they are
+        self._stream = stream or max_size is not None
+        self._max_size = max_size
+        self._timeout = timeout
+        self._stale_misses = 0
 
         super(FileConfigSource, self).__init__(source,
-                                               hint)
+                                               hint,
+                                               parser_options)
+        # what a last good result of the URL must have been parsed with
+        self._parse_settings = (hint,
+                                encoding,
+                                _freeze_options(parser_options))
 
         self._url_parts = parse.urlparse(self.source)
         # default scheme to file
         self._scheme = self._url_parts.scheme or 'file'
         self._scheme = self._scheme.lower()
 
+        # a compression extension hides the extension of the format
+        path, self._compression = split_compression(
+            self.source if self._scheme == 'file' else self._url_parts.path)
+
         # update hint for local file if not explicitly set
         if self._scheme == 'file' and not self.hint:
-            root, ext = os.path.splitext(self.source)
+            root, ext = os.path.splitext(path)
             if not ext:
                 ext = root
             if ext.startswith('.'):
                 ext = ext[1:]
             self._hint = FILE_EXTENSION_HINTS.get(ext, None)
 
+    def _with_options(self, **options):
+        result = super(FileConfigSource, self)._with_options(**options)
+        result._parse_settings = (self._parse_settings[0],
+                                  self._encoding,
+                                  _freeze_options(result.parser_options))
+        return result
+
     @property
     def encoding(self):
         return self._encoding
 
-    def load(self):
-        super(FileConfigSource, self).load()
+    @property
+    def scheme(self):
+        return self._scheme
+
+    @property
+    def compression(self):
+        return self._compression
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def breaker(self):
+        if self._breaker is None:
+            self._breaker = _remote(self).breaker
+        return self._breaker
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def stale_hits(self):
+        return self._stale_hits
+
+    @property
+    def stale_misses(self):
+        return self._stale_misses
+
+    @session.setter
+    def session(self, value):
+        self._session = value
+
+    @property
+    def serve_stale(self):
+        return self._serve_stale
+
+    @serve_stale.setter
+    def serve_stale(self, value):
+        self._serve_stale = value
+
+    def exists(self):
         if self._scheme == 'file':
-            return self._load_file()
+            return os.path.isfile(self.source)
         elif self._scheme.startswith('http'):
-            return self._load_http()
+            response = self._head()
+            if response is None:
+                return False
+            if response.status_code in (405, 501):
+                # no HEAD support, let the real request decide
+                return True
+            return response.ok
+        return False
+
+    def fingerprint(self):
+        version = None
+        if self._scheme == 'file':
+            version = _stat_fingerprint(self.source)
+        elif self._scheme.startswith('http'):
+            response = self._head()
+            if response is not None and response.ok:
+                version = response.headers.get('etag', None) or\
+                    response.headers.get('last-modified', None)
+        if version is None:
+            return None
+        return (_source_identity(self), version)
+
+    def load(self, include=None, exclude=None):
+        super(FileConfigSource, self).load(include, exclude)
+        key_filter = make_key_filter(include, exclude)
+        if self._scheme == 'file':
+            return self._load_file(key_filter)
+        elif self._scheme.startswith('http'):
+            return self._load_http(key_filter,
+                                   (_freeze(include), _freeze(exclude)))
         else:
             raise ValueError('Unsupported source scheme {0:s}'.format(
                 self._scheme))
 
-    def _load_file(self):
-        with io.open(self.source,
-                     mode='rt',
-                     encoding=(self.encoding or None)) as instream:
+    def _load_file(self, key_filter=None):
+        with io.open(self.source, mode='rb') as instream:
+            compression = self._compression or\
+                detect_compression(instream.peek(MAGIC_LENGTH))
+            if compression:
+                # decompressed as the parser reads it
+                return self._load_stream(
+                    open_compressed(instream, compression), key_filter)
+            if not self.encoding and Parser.accepts_bytes(self.hint):
+                return self._load_file_bytes(instream, key_filter)
+            return self._load_stream(instream, key_filter)
+
+    def _load_file_bytes(self, instream, key_filter=None):
+        data = _map_file(instream)
+        try:
+            return Parser.load(data, self, key_filter)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def _load_stream(self, stream, key_filter=None, encoding=None):
+        # parsers taking bytes only decode utf-8 themselves, any other
+        # charset is decoded here as the stream is read
+        if not self.encoding and Parser.accepts_bytes(self.hint) and\
+                (_is_utf8(encoding) or not Parser.is_textual(self.hint)):
+            if not self.hint:
+                # sniffing rewinds between parsers, read it once instead
+                return Parser.load(stream.read(), self, key_filter)
+            return Parser.load(stream, self, key_filter)
+
+        text = io.TextIOWrapper(stream,
+                                encoding=(self.encoding or encoding or None))
+        try:
             if not self.hint:
                 # avoid multiple reads if we don't know what the file hint is
-                return Parser.load(instream.read(), self)
-            else:
-                return Parser.load(instream, self)
+                return Parser.load(text.read(), self, key_filter)
+            return Parser.load(text, self, key_filter)
+        finally:
+            # the underlying stream is closed by its owner
+            text.detach()
+
+    @property
+    def _requests(self):
+        return self._session or requests
 
-    def _load_http(self):
+    def _head(self):
+        # probes go through the breaker as well, an open one is not waited on
+        if not self.breaker.allow():
+            return None
         try:
-            response = requests.get(self.source)
-            response.raise_for_status()
-        except (requests.HTTPError,
-                requests.ConnectionError,
+            response = self._requests.head(self.source,
+                                           allow_redirects=True,
+                                           timeout=self._timeout)
+        except (requests.ConnectionError,
                 requests.Timeout):
+            self.breaker.failure()
             return None
+        except Exception:
+            self.breaker.failure()
+            raise
+        if response.status_code >= 500 and response.status_code != 501:
+            self.breaker.failure()
+        else:
+            # no HEAD support is an answer too
+            self.breaker.success()
+        return response
+
+    def _load_http(self, key_filter=None, filters=None):
+        # kept per URL, a new source for it still finds the last result
+        remote = _remote(self)
+        settings = (self._parse_settings, filters)
+        last_good = remote.last_good
+        if last_good is not None and last_good[0] != settings:
+            last_good = None
+
+        if not self.breaker.allow():
+            # a server that keeps failing is not waited on again for now
+            return self._stale(last_good)
+
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if last_good is not None:
+            # ask for the body only if it changed since the last load
+            headers.update(last_good[1])
+
+        try:
+            response = self._requests.get(self.source,
+                                          headers=headers,
+                                          stream=self._stream,
+                                          timeout=self._timeout)
+        except (requests.ConnectionError,
+                requests.Timeout):
+            self.breaker.failure()
+            return self._stale(last_good)
+        except Exception:
+            # anything else ends a trial call as well, or the breaker
+            # would stay half open and refuse every call after it
+            self.breaker.failure()
+            raise
+
+        try:
+            if response.status_code >= 500:
+                self.breaker.failure()
+                return self._stale(last_good)
+
+            # the server answered, whatever it said
+            self.breaker.success()
+            if not response.ok:
+                return None
+
+            if response.status_code == 304:
+                if last_good is None or not last_good[1]:
+                    return None
+                return last_good[2].copy()
+
+            try:
+                result = self._parse_response(response, key_filter)
+            except (requests.ConnectionError,
+                    requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError):
+                # the body broke off or stalled part way through
+                self.breaker.failure()
+                return self._stale(last_good)
+        finally:
+            response.close()
+
+        validators = {}
+        if response.headers.get('etag', None):
+            validators['If-None-Match'] = response.headers['etag']
+        if response.headers.get('last-modified', None):
+            validators['If-Modified-Since'] = response.headers['last-modified']
+        if not isinstance(result, DictConfiguration):
+            remote.last_good = None
+        elif validators or self._serve_stale:
+            remote.last_good = (settings, validators, result.copy())
+        return result
+
+    def _stale(self, last_good):
+        if last_good is None or not self._serve_stale:
+            self._stale_misses += 1
+            return None
+        self._stale_hits += 1
+        return last_good[2].copy()
+
+    def _parse_response(self, response, key_filter=None):
+        content_type, charset = _content_type(response)
+
+        body = None
+        if self._stream:
+            size = response.headers.get('content-length', None)
+            if self._max_size is not None and size and size.isdigit() and\
+                    int(size) > self._max_size:
+                raise ValueError('{0:s} is larger than {1:d} bytes'.format(
+                    self.source, self._max_size))
+            body = io.BufferedReader(_ResponseBody(response,
+                                                   self.source,
+                                                   self._max_size))
+            head = body.peek(MAGIC_LENGTH)
+        else:
+            head = response.content[:MAGIC_LENGTH]
+
+        # compressed files, as opposed to a compressed transfer
+        compression = self._compression or\
+            COMPRESSION_MIME_TYPES.get(content_type, None) or\
+            detect_compression(head)
 
         if not self.hint:
-            content_type = response.headers.get('content-type', None)
             if content_type:
-                self._hint = MIME_TYPE_HINTS.get(content_type.lower(), None)
+                self._hint = MIME_TYPE_HINTS.get(content_type, None)
 
             # maybe a file extnsion of path?
             if not self.hint:
-                root, ext = os.path.splitext(self._url_parts.path)
+                root, ext = os.path.splitext(
+                    split_compression(self._url_parts.path)[0])
                 if not ext:
                     ext = root
                 if ext.startswith('.'):
                     ext = ext[1:]
                 self._hint = FILE_EXTENSION_HINTS.get(ext, None)
 
-        return Parser.load(response.text, self)
+        if body is not None:
+            # parsed while it downloads, never held in full
+            if compression:
+                body = open_compressed(body, compression)
+            if not charset:
+                charset = _detect_charset(body.peek(MAX_BOM_LENGTH))
+            return self._load_stream(body, key_filter, charset)
+        if compression:
+            return self._load_stream(
+                open_compressed(io.BytesIO(response.content), compression),
+                key_filter,
+                charset)
+        if self.hint and Parser.accepts_bytes(self.hint) and\
+                (not charset or not Parser.is_textual(self.hint)):
+            # the body as received, parsers that take bytes decode it
+            # themselves and binary formats never see text
+            return Parser.load(response.content, self, key_filter)
+        # decoded with the charset the server declared
+        return Parser.load(response.text, self, key_filter)
 
 
 class EmptyConfigSource(BaseConfigSource):
@@ -177,23 +521,42 @@ class EmptyConfigSource(BaseConfigSource):
         super(EmptyConfigSource, self).__init__(source,
                                                 hint)
 
-    def load(self):
-        super(EmptyConfigSource, self).load()
+    def exists(self):
+        return False
+
+    def fingerprint(self):
+        return ()
+
+    def load(self, include=None, exclude=None):
+        super(EmptyConfigSource, self).load(include, exclude)
         return None
 
 
 class LiteralConfigSource(BaseConfigSource):
     def __init__(self,
                  source,
-                 hint=None):
+                 hint=None,
+                 parser_options=None):
         if not hint:
             raise ValueError('Hint must be provided for a literal source')
         super(LiteralConfigSource, self).__init__(source,
-                                                  hint)
+                                                  hint,
+                                                  parser_options)
+
+    def exists(self):
+        return bool(self.source)
+
+    def fingerprint(self):
+        return (self.hint,
+                _freeze_options(self.parser_options),
+                type(self.source),
+                self.source)
 
-    def load(self):
-        super(LiteralConfigSource, self).load()
-        return Parser.load(self.source, self)
+    def load(self, include=None, exclude=None):
+        super(LiteralConfigSource, self).load(include, exclude)
+        return Parser.load(self.source,
+                           self,
+                           make_key_filter(include, exclude))
 
 
 class ObjectConfigSource(BaseConfigSource):
@@ -203,42 +566,973 @@ class ObjectConfigSource(BaseConfigSource):
         super(ObjectConfigSource, self).__init__(source,
                                                  hint)
 
-    def load(self):
-        super(ObjectConfigSource, self).load()
+    def exists(self):
+        return bool(self.source)
+
+    def fingerprint(self):
+        # the object may have changed since, so go by its content, and
+        # exactly, a hash would let different objects share a load
+        try:
+            return _freeze_content(self.source)
+        except TypeError:
+            # nothing to tell unhashable values apart, never cached
+            return None
+
+    def load(self, include=None, exclude=None):
+        super(ObjectConfigSource, self).load(include, exclude)
+        data = self.source
+        key_filter = make_key_filter(include, exclude)
+        if key_filter is not None:
+            data = key_filter.select(data)
         config_instance = DictConfiguration()
-        config_instance.update(self.source)
+        config_instance.update(data)
         return config_instance
 
 
-def load_config(targets, defaults=None, merge=True):
+class EnvConfigSource(BaseConfigSource):
+    # APP__DB__POOL_SIZE=10 with prefix APP becomes db.pool_size = 10
+    def __init__(self,
+                 prefix,
+                 separator='__',
+                 environ=None,
+                 lowercase=True,
+                 parse_values=True):
+        if not prefix or not separator:
+            raise ValueError('Prefix and separator must be provided')
+        super(EnvConfigSource, self).__init__(prefix)
+        self._separator = separator
+        self._environ = environ
+        self._lowercase = lowercase
+        self._parse_values = parse_values
+        # the matching variables and the tree built from them last time
+        self._snapshot = (None, None)
+
+    @property
+    def separator(self):
+        return self._separator
+
+    def exists(self):
+        start = self.source + self._separator
+        return any(x.startswith(start) for x in self._get_environ())
+
+    def fingerprint(self):
+        return (self.source,
+                self._separator,
+                self._lowercase,
+                self._parse_values,
+                tuple(self._items()))
+
+    def load(self, include=None, exclude=None):
+        super(EnvConfigSource, self).load(include, exclude)
+        items = self._items()
+
+        items_seen, result = self._snapshot
+        if items != items_seen:
+            result = DictConfiguration.from_flat(self._flatten(items))
+            self._snapshot = (items, result)
+
+        # the cached tree is handed out again, so never the tree itself
+        result = result.copy()
+        key_filter = make_key_filter(include, exclude)
+        if key_filter is not None:
+            result = DictConfiguration(key_filter.select(result))
+        return result
+
+    def _flatten(self, items):
+        # names are sorted, so a parent always comes before its children
+        # and a nested value wins over a plain one, just like assignments
+        size = len(self.source) + len(self._separator)
+        for name, value in items:
+            keys = name[size:].split(self._separator)
+            if not all(keys) or any('.' in x for x in keys):
+                continue
+            key = '.'.join(keys)
+            if self._lowercase:
+                key = key.lower()
+            if self._parse_values:
+                value = _parse_value(value)
+            yield key, value
+
+    def _items(self):
+        start = self.source + self._separator
+        return sorted((k, v) for k, v in six.iteritems(self._get_environ())
+                      if k.startswith(start))
+
+    def _get_environ(self):
+        return os.environ if self._environ is None else self._environ
+
+
+class DirectoryConfigSource(BaseConfigSource):
+    # every recognized fragment in a directory (or matching a glob pattern),
+    # merged in file name order
+    def __init__(self,
+                 source,
+                 hint=None,
+                 processes=None,
+                 parallel_threshold=64,
+                 parser_options=None):
+        if not source:
+            raise ValueError('Source not provided for directory config')
+        super(DirectoryConfigSource, self).__init__(source,
+                                                    hint,
+                                                    parser_options)
+        self._processes = processes
+        self._parallel_threshold = parallel_threshold
+        # path -> (stat fingerprint, filters, parsed fragment)
+        self._fragments = {}
+        # the paths and the merged result of the last load
+        self._merged = (None, None)
+        self._lock = threading.Lock()
+
+    def _with_options(self, **options):
+        result = super(DirectoryConfigSource, self)._with_options(**options)
+        # fragments parsed with other options are of no use to the copy
+        result._fragments = {}
+        result._merged = (None, None)
+        result._lock = threading.Lock()
+        return result
+
+    @property
+    def paths(self):
+        if os.path.isdir(self.source):
+            candidates = [os.path.join(self.source, x)
+                          for x in os.listdir(self.source)]
+        else:
+            candidates = glob.glob(self.source)
+
+        result = []
+        for path in sorted(candidates):
+            if not os.path.isfile(path):
+                continue
+            if self.hint or _extension_hint(path):
+                result.append(path)
+        return result
+
+    def exists(self):
+        return bool(self.paths)
+
+    def fingerprint(self):
+        return (_location(self),
+                self.hint,
+                _freeze_options(self.parser_options),
+                tuple((x, _stat_fingerprint(x)) for x in self.paths))
+
+    def load(self, include=None, exclude=None):
+        super(DirectoryConfigSource, self).load(include, exclude)
+        paths = self.paths
+        filters = (_freeze(include), _freeze(exclude))
+
+        with self._lock:
+            stale = []
+            stamps = {}
+            for path in paths:
+                stamps[path] = _stat_fingerprint(path)
+                cached = self._fragments.get(path, None)
+                if cached is None or cached[0] != stamps[path] or\
+                        cached[1] != filters:
+                    stale.append(path)
+
+            # only fragments that changed since the last load are parsed
+            for path, fragment in zip(stale,
+                                      self._parse(stale, include, exclude)):
+                self._fragments[path] = (stamps[path], filters, fragment)
+
+            for path in list(self._fragments):
+                if path not in stamps:
+                    del self._fragments[path]
+
+            merged_paths, config_instance = self._merged
+            if stale or merged_paths != paths:
+                config_instance = DictConfiguration()
+                for path in paths:
+                    fragment = self._fragments[path][2]
+                    if fragment:
+                        # cached fragments are kept, merge copies their nodes
+                        config_instance.merge(fragment)
+                self._merged = (paths, config_instance)
+            return config_instance.copy()
+
+    def _parse(self, paths, include, exclude):
+        jobs = [(x, self.hint, None, self.parser_options, include, exclude)
+                for x in paths]
+
+        processes = self._processes
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if processes < 2 or len(jobs) < max(self._parallel_threshold, 2):
+            return [_load_fragment(x) for x in jobs]
+
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            # workers send back plain dicts, nodes are rebuilt here
+            return [DictConfiguration._adopt(x)
+                    for x in pool.map(_load_plain_fragment, jobs)]
+        finally:
+            pool.terminate()
+
+
+class LazyConfigSource(BaseConfigSource):
+    def __init__(self,
+                 source,
+                 prefixes=None):
+        target = _normalize_target(source)
+        if isinstance(prefixes, six.string_types):
+            prefixes = [prefixes, ]
+        self._target = target
+        self._prefixes = list(prefixes) if prefixes else None
+        super(LazyConfigSource, self).__init__(target.source,
+                                               None,
+                                               target.parser_options)
+        self._hint = target.hint
+
+    def __repr__(self):
+        return '{0:s}({1!r}, {2!r})'.format(
+            self.__class__.__name__,
+            self.target,
+            self.prefixes)
+
+    @property
+    def target(self):
+        return self._target
+
+    @property
+    def prefixes(self):
+        return self._prefixes
+
+    def exists(self):
+        return self.target.exists()
+
+    def _with_options(self, **options):
+        result = super(LazyConfigSource, self)._with_options(**options)
+        # pylint: disable=W0212
+        result._target = self._target._with_options(**options)
+        return result
+
+    def load(self, include=None, exclude=None):
+        super(LazyConfigSource, self).load(include, exclude)
+        return _load_target(self.target, include, exclude)
+
+
+def load_config(targets,
+                defaults=None,
+                merge=True,
+                include=None,
+                exclude=None,
+                interpolate=False,
+                schema=None,
+                offload_threshold=None,
+                cache=None):
     targets = _normalize_targets(targets)
+    if schema is not None:
+        # declared keys are parsed as declared, instead of guessed at and
+        # converted back during validation
+        schema = compile_schema(schema)
+        targets = [_with_schema(x, schema) for x in targets]
+
+    config_instance = None
+    key = None
+    if cache is not None:
+        key = _cache_key(targets, merge, include, exclude)
+        if key is not None:
+            config_instance = cache.get(key)
+
+    if config_instance is None:
+        config_instance = _merge_targets(
+            targets, merge, include, exclude, offload_threshold)
+        # pylint: disable=W0212
+        if key is not None and config_instance._lazy is None:
+            cache.put(key, config_instance, [_location(x) for x in targets])
+
+    if config_instance.frozen and (interpolate or schema is not None):
+        # both write to the configuration, the shared one stays as it is
+        config_instance = config_instance.copy()
+    if interpolate:
+        # references can point into any source, so only once all are merged
+        Interpolator(config_instance)
+    if schema is not None:
+        schema.validate(config_instance)
+
+    return config_instance
+
+
+def _merge_targets(targets, merge, include, exclude, offload_threshold):
     config_instance = DictConfiguration()
+    lazy = None
 
-    for target in targets:
-        if isinstance(target, EmptyConfigSource):
-            continue
+    # large local files are parsed in worker processes, all of them at once,
+    # while this process stays free to do other work
+    pool, offloaded = _offload(targets, offload_threshold, include, exclude)
+
+    try:
+        for target in targets:
+            if isinstance(target, EmptyConfigSource):
+                continue
+
+            if merge and isinstance(target, LazyConfigSource):
+                # only check that it is there, parsing waits for a lookup
+                if target.exists():
+                    if lazy is None:
+                        lazy = _LazyLayers(include, exclude)
+                    lazy.defer(target)
+                continue
 
-        next_config = target.load()
+            pending = offloaded.get(id(target), None)
+            if pending is not None:
+                # pylint: disable=W0212
+                next_config = DictConfiguration._adopt(pending.get())
+            else:
+                next_config = _load_target(target, include, exclude)
+            if next_config:
+                if lazy is not None:
+                    lazy.shadow(next_config)
+                # pylint: disable=W0212
+                config_instance._merge(next_config, False)
+                if not merge:
+                    break
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    if lazy is not None:
+        # pylint: disable=W0212
+        config_instance._lazy = lazy
+
+    return config_instance
+
+
+def load_first_found_config(targets,
+                            defaults=None,
+                            include=None,
+                            exclude=None,
+                            parallel=None,
+                            interpolate=False,
+                            schema=None):
+    config_instance = DictConfiguration()
+    if schema is not None:
+        schema = compile_schema(schema)
+
+    # only candidates that pass a cheap existence check are ever parsed
+    for target in _found_targets(targets, parallel):
+        if schema is not None:
+            target = _with_schema(target, schema)
+        next_config = _load_target(target, include, exclude)
         if next_config:
-            config_instance.merge(next_config)
-            if not merge:
-                break
+            # pylint: disable=W0212
+            config_instance._merge(next_config, False)
+            break
+
+    if interpolate:
+        Interpolator(config_instance)
+    if schema is not None:
+        schema.validate(config_instance)
 
     return config_instance
 
 
-def load_first_found_config(targets, defaults=None):
-    return load_config(targets, merge=False)
+# copies of sources parsing with a schema, by source and schema
+_SCHEMA_SOURCES = weakref.WeakKeyDictionary()
+_SCHEMA_SOURCES_LOCK = threading.Lock()
+
+
+def _with_schema(target, schema):
+    # copies are kept for as long as the source, so repeated loads still
+    # find what the copy cached, an explicit schema option is left alone
+    if 'schema' in target.parser_options:
+        return target
+    with _SCHEMA_SOURCES_LOCK:
+        copies = _SCHEMA_SOURCES.setdefault(target, {})
+        result = copies.get(schema, None)
+        if result is None:
+            # pylint: disable=W0212
+            result = copies[schema] = target._with_options(schema=schema)
+    return result
+
+
+def _offload(targets, threshold, include=None, exclude=None):
+    if threshold is None:
+        return None, {}
+
+    large = []
+    for target in targets:
+        if not isinstance(target, FileConfigSource) or\
+                target.scheme != 'file':
+            continue
+        try:
+            if os.path.getsize(target.source) >= threshold:
+                large.append(target)
+        except EnvironmentError:
+            # let the regular load report it
+            continue
+
+    if not large:
+        return None, {}
+
+    pool = multiprocessing.Pool(min(len(large), multiprocessing.cpu_count()))
+    offloaded = {}
+    for target in large:
+        job = (target.source,
+               target.hint,
+               target.encoding,
+               target.parser_options,
+               include,
+               exclude)
+        offloaded[id(target)] = pool.apply_async(_load_plain_fragment,
+                                                 (job, ))
+    return pool, offloaded
+
+
+def _found_targets(targets, parallel=None):
+    targets = _as_sequence(targets)
+
+    if not parallel or parallel < 2:
+        # normalize as we go, nothing past the first hit is touched
+        for target in targets:
+            target = _normalize_target(target)
+            if target.exists():
+                yield target
+        return
+
+    targets = [_normalize_target(x) for x in targets]
+    if not targets:
+        return
+
+    pool = ThreadPool(min(parallel, len(targets)))
+    try:
+        # results come back in order, so the first hit is yielded as soon
+        # as it and every candidate before it have been probed
+        for target, found in six.moves.zip(
+                targets,
+                pool.imap(_target_exists, targets)):
+            if found:
+                yield target
+    finally:
+        pool.terminate()
+
+
+def _target_exists(target):
+    return target.exists()
+
+
+class LoadCache(object):
+    # merged load_config results keyed by their sources and the version of
+    # each source, the least recently used entries are dropped first, every
+    # result is frozen and the same one is handed to everyone asking for it
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        if max_entries < 1:
+            raise ValueError('Cache must hold at least one entry')
+        self._max_entries = max_entries
+        # key -> (merged config, locations of its sources)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_entries(self):
+        return self._max_entries
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries[key] = entry
+            self._hits += 1
+        return entry[0]
+
+    def put(self, key, config, locations=()):
+        config.freeze()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (config, frozenset(locations))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, targets=None):
+        # drop every result any of the files, URLs or directories went into
+        with self._lock:
+            if targets is None:
+                self._entries.clear()
+                return
+
+            locations = set(_location(x) for x in _normalize_targets(targets))
+            locations.discard(None)
+            for key in [k for k, v in six.iteritems(self._entries)
+                        if not v[1].isdisjoint(locations)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+class ReloadingConfig(object):
+    def __init__(self,
+                 targets,
+                 defaults=None,
+                 include=None,
+                 exclude=None,
+                 interpolate=False,
+                 schema=None,
+                 offload_threshold=None,
+                 cache=None):
+        # normalized once, so sources keep what they know between reloads
+        self._targets = _normalize_targets(targets)
+        self._defaults = defaults
+        self._include = include
+        self._exclude = exclude
+        self._interpolate = interpolate
+        self._schema = schema
+        self._offload_threshold = offload_threshold
+        self._cache = cache
+        self._subscriptions = SubscriptionRegistry()
+        self._lock = threading.Lock()
+        self._config = self._load()
+        self._forwarding = self._config.subscribe(None, self._forward)
+
+    @property
+    def config(self):
+        return self._config
+
+    def subscribe(self, prefix, callback):
+        # fires for changes made to the current config and for reloads
+        return self._subscriptions.subscribe(prefix, callback)
+
+    def accessor(self, key, default=None):
+        # follows the newest snapshot across reloads
+        return Accessor(self, key, default=default)
+
+    def reload(self):
+        next_config = self._load()
+
+        with self._lock:
+            previous = self._config
+            changes = diff(previous, next_config)
+            # listeners follow the newest snapshot
+            self._forwarding.cancel()
+            self._forwarding = next_config.subscribe(None, self._forward)
+            self._config = next_config
+
+        if changes:
+            self._subscriptions.dispatch(
+                next_config,
+                [tuple(x.split('.')) for x in changes.paths])
+
+        return changes
+
+    def _forward(self, config, paths):
+        self._subscriptions.dispatch(config,
+                                     [tuple(x.split('.')) for x in paths])
+
+    def _load(self):
+        return load_config(self._targets,
+                           defaults=self._defaults,
+                           include=self._include,
+                           exclude=self._exclude,
+                           interpolate=self._interpolate,
+                           schema=self._schema,
+                           offload_threshold=self._offload_threshold,
+                           cache=self._cache)
+
+
+# loads of the same source that overlap in time are only done once
+_FLIGHTS = SingleFlight()
+
+# breakers and last good results by URL, load_config builds new sources on
+# every call and they would forget both otherwise
+_REMOTES = collections.OrderedDict()
+_REMOTES_LOCK = threading.Lock()
+
+
+class _Remote(object):
+    __slots__ = ('breaker', 'last_good')
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        # settings and filters of the load, conditional request headers and
+        # the result
+        self.last_good = None
+
+
+def _remote(target):
+    location = _location(target)
+    with _REMOTES_LOCK:
+        remote = _REMOTES.pop(location, None)
+        if remote is None:
+            remote = _Remote()
+        # least recently used URLs are forgotten first
+        _REMOTES[location] = remote
+        while len(_REMOTES) > MAX_REMOTES:
+            _REMOTES.popitem(last=False)
+    return remote
+
+
+def _load_target(target, include=None, exclude=None):
+    identity = _source_identity(target)
+    if identity is None:
+        return _load_target_now(target, include, exclude)
+    return _FLIGHTS.do((identity, _freeze(include), _freeze(exclude)),
+                       lambda: _load_target_now(target, include, exclude),
+                       share=_share)
+
+
+def _load_target_now(target, include=None, exclude=None):
+    if include is None and not exclude:
+        # keep working with sources that predate key filtering
+        return target.load()
+    return target.load(include=include, exclude=exclude)
+
+
+class _LazyLayers(object):
+    def __init__(self, include=None, exclude=None):
+        self._include = include
+        self._exclude = exclude
+        self._pending = []
+        self._positions = itertools.count()
+        # readers wait here while a layer is being merged, the thread doing
+        # the merge passes straight through its own lookups
+        self._lock = threading.RLock()
+        self._resolving = False
+
+    def defer(self, source):
+        self._pending.append(_LazyLayer(source, next(self._positions)))
+
+    def shadow(self, later_config):
+        # layers loaded after a deferred one must still win once it is
+        # merged, so keep a copy of whatever overlaps its prefixes
+        position = next(self._positions)
+        for layer in self._pending:
+            layer.shadow(later_config, position)
+
+    def resolve(self, config, keys=None):
+        with self._lock:
+            if self._resolving:
+                # a lookup made by the merge below
+                return
+            due = [x for x in self._pending if x.overlaps(keys)]
+            if not due:
+                return
+
+            # the config keeps pointing here until every due layer is in,
+            # so other threads wait instead of reading a half merged tree
+            self._resolving = True
+            try:
+                for layer in due:
+                    self._pending.remove(layer)
+                    loaded = layer.load(self._include, self._exclude)
+                    if not loaded:
+                        continue
+                    # later deferred layers act like loaded ones from now on
+                    for other in self._pending:
+                        if other.position < layer.position:
+                            other.shadow(loaded, layer.position)
+                    layer.apply(config, loaded)
+            finally:
+                self._resolving = False
+                if not self._pending:
+                    # pylint: disable=W0212
+                    config._lazy = None
+
+
+class _LazyLayer(object):
+    def __init__(self, source, position):
+        self.source = source
+        self.position = position
+        # merges are only independent per top-level key, a value further
+        # down can be wiped by a scalar above it, so work in whole sections
+        self._sections = None
+        if source.prefixes:
+            self._sections = set(x.split('.')[0] for x in source.prefixes)
+        self._shadows = []
+
+    def overlaps(self, keys):
+        if keys is None or self._sections is None:
+            return True
+        return keys[0] in self._sections
+
+    def shadow(self, later_config, position):
+        if self._sections is not None:
+            later_config = dict(
+                (k, v) for k, v in six.iteritems(later_config)
+                if k in self._sections)
+        if later_config:
+            # pylint: disable=W0212
+            later_config = DictConfiguration._make_dict_config(later_config)
+            self._shadows.append((position, later_config.copy()))
+
+    def load(self, include=None, exclude=None):
+        if self._sections is None:
+            return _load_target(self.source, include, exclude)
+
+        loaded = _load_target(self.source,
+                              self.source.prefixes,
+                              exclude)
+        if loaded and include is not None:
+            loaded = KeyFilter(include=include).select(loaded)
+        return loaded
+
+    def apply(self, config, loaded):
+        # merging is a left fold, so (a + later) + lazy + later is the same
+        # as a + lazy + later and the merged sections are fixed in place
+        # both are fresh and dropped afterwards, their nodes are taken as is
+        # pylint: disable=W0212
+        config._merge(loaded, False)
+        for _, shadow in sorted(self._shadows, key=lambda x: x[0]):
+            config._merge(shadow, False)
+        self._shadows = []
+
+
+def _load_fragment(job):
+    path, hint, encoding, parser_options, include, exclude = job
+    source = FileConfigSource(path,
+                              hint=hint or _extension_hint(path),
+                              encoding=encoding,
+                              parser_options=parser_options)
+    # runs in forked workers too, which inherit the loads in flight in the
+    # parent without the threads that would finish them, so never coalesce
+    return _load_target_now(source, include, exclude)
+
+
+def _load_plain_fragment(job):
+    return _to_plain(_load_fragment(job))
+
+
+def _to_plain(config):
+    # nested plain dicts pickle without the node bookkeeping
+    if not isinstance(config, collections.Mapping):
+        return config
+
+    result = {}
+    remaining = collections.deque()
+    remaining.append((result, config))
+    while True:
+        try:
+            target, current = remaining.popleft()
+        except IndexError:
+            break
+        # pylint: disable=W0212
+        store = getattr(current, '_internal_store', current)
+        for k, v in six.iteritems(store):
+            if isinstance(v, collections.Mapping):
+                child = {}
+                target[k] = child
+                remaining.append((child, v))
+            else:
+                target[k] = v
+    return result
+
+
+def _extension_hint(path):
+    ext = os.path.splitext(split_compression(path)[0])[1]
+    if ext.startswith('.'):
+        ext = ext[1:]
+    return FILE_EXTENSION_HINTS.get(ext.lower(), None)
+
+
+def _stat_fingerprint(path):
+    try:
+        stat = os.stat(path)
+    except EnvironmentError:
+        return None
+    return (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+
+
+def _cache_key(targets, merge, include, exclude):
+    versions = []
+    for target in targets:
+        version = target.fingerprint()
+        if version is None:
+            return None
+        versions.append((type(target), version))
+    return (tuple(versions), merge, _freeze(include), _freeze(exclude))
+
+
+def _source_identity(target):
+    if not isinstance(target, FileConfigSource):
+        return None
+    identity = (type(target),
+                _location(target),
+                target.hint,
+                target.encoding,
+                _freeze_options(target.parser_options))
+    if target.scheme == 'file':
+        return identity
+    # pylint: disable=W0212
+    # remote loads also differ in how they are fetched and what a failure
+    # gives back, loads only share a result when all of that matches, the
+    # breaker by its settings as every source may have one of its own
+    breaker = target.breaker
+    return identity + (target.session,
+                       (breaker.failure_threshold, breaker.reset_timeout),
+                       target.serve_stale,
+                       target._stream,
+                       target.max_size,
+                       target.timeout)
+
+
+def _location(target):
+    if isinstance(target, DirectoryConfigSource) or\
+            isinstance(target, FileConfigSource) and target.scheme == 'file':
+        return os.path.normcase(os.path.abspath(target.source))
+    if isinstance(target, FileConfigSource):
+        # pylint: disable=W0212
+        parts = target._url_parts
+        return parse.urlunparse((target.scheme,
+                                 parts.netloc.lower(),
+                                 parts.path or '/',
+                                 parts.params,
+                                 parts.query,
+                                 ''))
+    return None
+
+
+def _freeze_options(options):
+    if not options:
+        return None
+    frozen = []
+    for k, v in sorted(six.iteritems(options)):
+        kind = type(v)
+        if isinstance(v, list):
+            v = tuple(v)
+        try:
+            hash(v)
+        except TypeError:
+            # equal but distinct options only miss out on sharing a load
+            v = id(v)
+        frozen.append((k, kind, v))
+    return tuple(frozen)
+
+
+def _freeze_content(value):
+    # an immutable copy that only equals copies of equal content of the
+    # same types, 1 and True or 1 and 1.0 are different configurations
+    if isinstance(value, collections.Mapping):
+        return (type(value), frozenset((_freeze_content(k),
+                                        _freeze_content(v))
+                                       for k, v in six.iteritems(value)))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze_content(x) for x in value))
+    if isinstance(value, (set, frozenset)):
+        return (type(value), frozenset(_freeze_content(x) for x in value))
+    hash(value)
+    return (type(value), value)
+
+
+def _share(config):
+    # everyone sharing a load gets their own tree
+    if isinstance(config, DictConfiguration):
+        return config.copy()
+    return config
+
+
+def _freeze(prefixes):
+    if prefixes is None:
+        return None
+    if isinstance(prefixes, six.string_types):
+        return (prefixes, )
+    return tuple(prefixes)
+
+
+class _ResponseBody(io.RawIOBase):
+    # the body of a streamed response as a file, never more than max_size
+    def __init__(self, response, source, max_size=None):
+        super(_ResponseBody, self).__init__()
+        self._chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+        self._source = source
+        self._max_size = max_size
+        self._size = 0
+        self._chunk = b''
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._chunk):
+            try:
+                self._chunk = next(self._chunks)
+            except StopIteration:
+                return 0
+            self._offset = 0
+            self._size += len(self._chunk)
+            if self._max_size is not None and self._size > self._max_size:
+                raise ValueError('{0:s} is larger than {1:d} bytes'.format(
+                    self._source, self._max_size))
+
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+def _content_type(response):
+    # text/plain; charset=utf-8 -> (text/plain, utf-8)
+    header = response.headers.get('content-type', None) or ''
+    parts = header.split(';')
+    charset = None
+    for part in parts[1:]:
+        name, _, value = part.partition('=')
+        if name.strip().lower() == 'charset':
+            charset = value.strip().strip('"\'') or None
+    return parts[0].strip().lower(), charset
+
+
+def _detect_charset(head):
+    # without a declared charset only a byte order mark tells, anything
+    # else is read as utf-8
+    for bom, charset in BYTE_ORDER_MARKS:
+        if head.startswith(bom):
+            return charset
+    return 'utf-8'
+
+
+def _is_utf8(charset):
+    if not charset:
+        return True
+    try:
+        return codecs.lookup(charset).name in ('utf-8', 'utf-8-sig')
+    except LookupError:
+        return False
+
+
+def _map_file(instream):
+    # map the file so parsers that accept bytes read straight from the page
+    # cache instead of through a decoded copy of the whole file
+    try:
+        if os.fstat(instream.fileno()).st_size == 0:
+            # empty files cannot be mapped
+            return instream.read()
+        return mmap.mmap(instream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError, mmap.error):
+        # not a regular file (pipe, device, etc), read it as a stream
+        return instream
 
 
 def _normalize_targets(targets):
+    return [_normalize_target(x) for x in _as_sequence(targets)]
+
+
+def _as_sequence(targets):
     # make this a list if not a list
     if isinstance(targets, six.string_types) or\
             isinstance(targets, collections.Mapping) or\
             not isinstance(targets, collections.Iterable):
         targets = (targets, )
-
-    return [_normalize_target(x) for x in targets]
+    return targets
 
 
 def _normalize_target(target):
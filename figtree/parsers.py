@@ -19,6 +19,10 @@ from __future__ import unicode_literals
 from __future__ import with_statement
 
 import abc
+import locale
+import io
+import mmap
+import sys
 
 try:
     import configparser
@@ -44,7 +48,30 @@ try:
 except ImportError:
     import json
 
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# python 2.6 has no memoryview
+MEMORYVIEW = getattr(six.moves.builtins, 'memoryview', None)
+BUFFER_TYPES = tuple(x for x in (bytearray, MEMORYVIEW) if x is not None)
+
+# the stdlib json only takes bytes on python 3 from 3.6 on
+JSON_TAKES_BYTES = six.PY2 or sys.version_info >= (3, 6) or\
+    json.__name__ == 'simplejson'
+
 from .dictconfig import DictConfiguration
+from .filters import INCLUDE, EXCLUDE, DESCEND
+from .jsonstream import load_json_stream, _detect_encoding
 
 
 CONFIGPARSER_DEFAULTS = {
@@ -72,7 +99,8 @@ class ParserMeta(abc.ABCMeta):
         # check if message type is registered
         parsers = getattr(cls_new, '_parsers', None)
         if parsers is None:
-            parsers = {}
+            # sniffing tries parsers in the order they were registered
+            parsers = OrderedDict()
             setattr(cls_new, '_parsers', parsers)
 
         # only register if not abstract
@@ -86,23 +114,65 @@ class ParserMeta(abc.ABCMeta):
 class Parser(object):
     abstract = True
 
-    def __init__(self):
-        pass
+    # parsers that can consume raw bytes, buffers and binary streams directly
+    # set this so they are handed undecoded input
+    binary = False
+
+    # formats made of text, binary ones are never decoded with a charset
+    textual = True
+
+    def __init__(self, key_filter=None, **options):
+        # options come from the source and are shared by every parser tried
+        # while sniffing, so ignore the ones that do not apply
+        self._key_filter = key_filter
+        self._options = options
+
+    @classmethod
+    def accepts_bytes(cls, hint):
+        # pylint: disable=E1101
+        loader = cls._parsers.get(hint, None)
+        if loader:
+            return loader.binary
+        # unknown hint, bytes are only decoded for parsers that need text
+        return True
+
+    @classmethod
+    def is_textual(cls, hint):
+        # pylint: disable=E1101
+        loader = cls._parsers.get(hint, None)
+        if loader:
+            return loader.textual
+        return True
 
     @classmethod
-    def load(cls, data, source):
+    def load(cls, data, source, key_filter=None):
         # pylint: disable=E1101
         loader = cls._parsers.get(source.hint, None)
 
         if loader:
+            if not loader.binary and _is_binary(data):
+                data = _decode(data, source)
             # pylint: disable=W0212
-            return loader()._load(data)
+            return loader(key_filter=key_filter,
+                          **_options(source))._load(data)
 
         result = None
+        decoded = None
         for x in cls._parsers.values():
             try:
+                prepared = data
+                if _is_binary(data):
+                    if x.binary:
+                        _rewind(data)
+                    else:
+                        # decode at most once no matter how many text
+                        # parsers are attempted
+                        if decoded is None:
+                            decoded = _decode(data, source)
+                        prepared = decoded
                 # pylint: disable=W0212
-                result = x()._load(data)
+                result = x(key_filter=key_filter,
+                           **_options(source))._load(prepared)
                 break
             except Exception as e:
                 # logging.exception(e)
@@ -117,10 +187,15 @@ class Parser(object):
 
 class YamlParser(Parser):
     name = 'yaml'
+    binary = True
 
     def _load(self, data):
         super(YamlParser, self)._load(data)
+        if isinstance(data, BUFFER_TYPES):
+            data = _as_bytes(data)
         loaded_data = yaml.safe_load(data)
+        if self._key_filter is not None:
+            loaded_data = self._key_filter.select(loaded_data)
         config_instance = DictConfiguration()
         config_instance.update(loaded_data)
         return config_instance
@@ -128,19 +203,56 @@ class YamlParser(Parser):
 
 class JsonParser(Parser):
     name = 'json'
+    binary = True
 
     def _load(self, data):
         super(JsonParser, self)._load(data)
-        loaded_data = None
+        if self._options.get('stream', False) or\
+                self._key_filter is not None or\
+                isinstance(data, mmap.mmap):
+            # streaming skips unwanted subtrees without decoding them, and
+            # reads mapped files a chunk at a time instead of copying them
+            return load_json_stream(
+                data,
+                prefixes=self._options.get('prefixes', None),
+                chunk_size=self._options.get('chunk_size', None),
+                key_filter=self._key_filter)
+
         if hasattr(data, 'read'):
-            loaded_data = json.load(data)
-        else:
-            loaded_data = json.loads(data)
+            data = data.read()
+        if not isinstance(data, six.string_types):
+            data = _as_bytes(data)
+            if not JSON_TAKES_BYTES:
+                data = data.decode(_detect_encoding(data[:4]))
+        loaded_data = json.loads(data)
         config_instance = DictConfiguration()
         config_instance.update(loaded_data)
         return config_instance
 
 
+# registered ahead of ini, toml is strict enough to try first when sniffing
+class TomlParser(Parser):
+    name = 'toml'
+    binary = True
+
+    def _load(self, data):
+        super(TomlParser, self)._load(data)
+        if tomllib is None:
+            raise ValueError('TOML support requires tomllib or tomli')
+
+        # toml documents are always utf-8
+        if hasattr(data, 'read') and not isinstance(data, mmap.mmap):
+            data = data.read()
+        if not isinstance(data, six.text_type):
+            data = _as_bytes(data).decode('utf-8')
+
+        loaded_data = tomllib.loads(data)
+        if self._key_filter is not None:
+            loaded_data = self._key_filter.select(loaded_data)
+        # the decoded tables are ours, so they become nodes in place
+        return DictConfiguration._adopt(loaded_data)
+
+
 class IniParser(Parser):
     name = 'ini'
 
@@ -161,19 +273,34 @@ class IniParser(Parser):
                 parser.read_string(data)
             else:
                 parser.readfp(data)
+        key_filter = self._key_filter
+        schema = self._options.get('schema', None)
         for section in parser.sections():
+            action = INCLUDE
+            if key_filter is not None:
+                action = key_filter.action(tuple(section.split('.')))
+                if action == EXCLUDE:
+                    # never even interpolate the items of unwanted sections
+                    continue
             for item, value in parser.items(section):
                 key = '{0:s}.{1:s}'.format(section, item)
-                value = _parse_value(value)
-                if not isinstance(value, six.string_types) and\
-                        isinstance(value, collections.Sequence):
-                    value = [_parse_value(x) for x in value]
+                if action != INCLUDE and\
+                        not key_filter.keeps_leaf(tuple(key.split('.'))):
+                    continue
+                if schema is not None and schema.declares(key):
+                    value = _coerce(schema, key, value)
+                else:
+                    value = _parse_value(value)
+                    if not isinstance(value, six.string_types) and\
+                            isinstance(value, collections.Sequence):
+                        value = [_parse_value(x) for x in value]
                 config_instance[key] = value
         return config_instance
 
 
 class XmlParser(Parser):
     name = 'xml'
+    binary = True
 
     def _load(self, data):
         super(XmlParser, self)._load(data)
@@ -184,25 +311,45 @@ class XmlParser(Parser):
                     else six.BytesIO(data)
         tree = lxml.objectify.parse(data)
 
+        key_filter = self._key_filter
+        schema = self._options.get('schema', None)
+
         # use queue to avoid recursion and prime it with the immediate children
         elements = collections.deque()
         for x in tree.getroot().iterchildren():
-            elements.append(('', x))
+            elements.append(('', x, key_filter is None))
 
         while True:
             try:
-                prefix, element = elements.popleft()
+                prefix, element, included = elements.popleft()
             except IndexError:
                 break
             key = element.tag
             if prefix:
                 key = '{0:s}.{1:s}'.format(prefix, element.tag)
-            if isinstance(element, lxml.objectify.ObjectifiedDataElement):
+            is_data = isinstance(element,
+                                 lxml.objectify.ObjectifiedDataElement)
+            if not included:
+                # prune unwanted subtrees before walking them
+                action = key_filter.action(tuple(key.split('.')))
+                if action == EXCLUDE or\
+                        (is_data and action == DESCEND):
+                    continue
+                included = action == INCLUDE
+            if is_data:
                 previous = config_instance.get(key, None)
-                value = _parse_value(element.pyval)
+                declared = schema is not None and schema.declares(key)
+                if declared:
+                    value = _coerce(schema, key, element.text)
+                else:
+                    value = _parse_value(element.pyval)
                 if previous:
                     if isinstance(previous, collections.MutableSequence):
-                        previous.append(value)
+                        if declared and isinstance(value, list):
+                            # declared lists come back as lists already
+                            previous.extend(value)
+                        else:
+                            previous.append(value)
                     else:
                         value = [previous, value]
                         config_instance[key] = value
@@ -210,11 +357,112 @@ class XmlParser(Parser):
                     config_instance[key] = value
             else:
                 for x in element.iterchildren():
-                    elements.append((key, x))
+                    elements.append((key, x, included))
 
         return config_instance
 
 
+class MsgpackParser(Parser):
+    name = 'msgpack'
+    binary = True
+    textual = False
+
+    def _load(self, data):
+        super(MsgpackParser, self)._load(data)
+        if msgpack is None:
+            raise ValueError('MessagePack support requires msgpack')
+        if not _is_binary(data):
+            raise ValueError('MessagePack data must be binary')
+
+        # buffers (including mapped files) are decoded without a copy
+        if hasattr(data, 'read') and not isinstance(data, mmap.mmap):
+            _rewind(data)
+            data = data.read()
+        loaded_data = msgpack.unpackb(data,
+                                      raw=False,
+                                      strict_map_key=False)
+        if not isinstance(loaded_data, collections.Mapping):
+            raise ValueError('MessagePack configuration must be a map')
+        if self._key_filter is not None:
+            loaded_data = self._key_filter.select(loaded_data)
+        return DictConfiguration._adopt(loaded_data)
+
+
+def dump_msgpack(config, stream=None):
+    # nodes are packed straight from their stores, no plain copy is made
+    if msgpack is None:
+        raise ValueError('MessagePack support requires msgpack')
+    packed = msgpack.packb(config,
+                           default=_msgpack_default,
+                           use_bin_type=True)
+    if stream is None:
+        return packed
+    stream.write(packed)
+
+
+def _msgpack_default(value):
+    if isinstance(value, DictConfiguration):
+        # pylint: disable=W0212
+        if value._lazy is not None:
+            # layers not loaded yet are part of the configuration too
+            value._lazy.resolve(value)
+        return value._internal_store
+    if isinstance(value, collections.Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError('Cannot serialize {0!r}'.format(value))
+
+
+def _options(source):
+    return getattr(source, 'parser_options', None) or {}
+
+
+def _is_binary(data):
+    if isinstance(data, six.string_types):
+        # python 2 str is both text and bytes, treat it as text like before
+        return False
+    if isinstance(data, (six.binary_type, mmap.mmap) + BUFFER_TYPES):
+        return True
+    return isinstance(data, (io.RawIOBase, io.BufferedIOBase))
+
+
+def _as_bytes(data):
+    if isinstance(data, mmap.mmap):
+        return data[:]
+    if MEMORYVIEW is not None and isinstance(data, MEMORYVIEW):
+        return data.tobytes()
+    return six.binary_type(data)
+
+
+def _rewind(data):
+    # a failed attempt by another parser may have consumed part of a stream
+    if hasattr(data, 'seek'):
+        data.seek(0)
+
+
+def _decode(data, source):
+    encoding = getattr(source, 'encoding', None) or\
+        locale.getpreferredencoding(False)
+    if isinstance(data, mmap.mmap):
+        raw = data[:]
+    elif hasattr(data, 'read'):
+        _rewind(data)
+        raw = data.read()
+    else:
+        raw = six.binary_type(data)
+    return raw.decode(encoding)
+
+
+def _coerce(schema, key, value):
+    # declared keys are converted as declared instead of guessed at, values
+    # that do not fit are kept as they are for validation to report
+    try:
+        return schema.coerce(key, value)
+    except (ValueError, TypeError):
+        return value
+
+
 def _parse_value(value):
     handlers = [
         (int, (ValueError, )),
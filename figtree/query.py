@@ -0,0 +1,248 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+import re
+
+import six
+
+
+# compiled patterns are kept around, cleared whenever this many are cached
+MAX_CACHED_PATTERNS = 256
+
+_PATTERNS = {}
+
+
+class KeyPattern(object):
+    # a dotted key pattern, * and ? match within a single key segment while
+    # a ** segment matches any number of segments (including none)
+    def __init__(self, pattern):
+        if not pattern or not isinstance(pattern, six.string_types):
+            raise ValueError('Invalid key pattern {0!r}'.format(pattern))
+
+        segments = tuple(pattern.split('.'))
+        if not all(segments):
+            raise ValueError('Invalid key pattern {0!r}'.format(pattern))
+
+        self._pattern = pattern
+        self._regex = re.compile(_translate(segments))
+
+        # the literal segments narrow down which paths are worth matching
+        self.prefix = ()
+        for segment in segments:
+            if _is_wildcard(segment):
+                break
+            self.prefix += (segment, )
+        self.name = None
+        if not _is_wildcard(segments[-1]):
+            self.name = segments[-1]
+
+    def __repr__(self):
+        return '{0:s}({1!r})'.format(self.__class__.__name__, self._pattern)
+
+    @property
+    def pattern(self):
+        return self._pattern
+
+    def matches(self, key):
+        return self._regex.match(key) is not None
+
+
+def compile_pattern(pattern):
+    if isinstance(pattern, KeyPattern):
+        return pattern
+
+    result = _PATTERNS.get(pattern, None)
+    if result is None:
+        result = KeyPattern(pattern)
+        if len(_PATTERNS) >= MAX_CACHED_PATTERNS:
+            _PATTERNS.clear()
+        _PATTERNS[pattern] = result
+    return result
+
+
+class PathIndex(object):
+    # every key path in a tree, both as a trie and grouped by the last key
+    # segment, kept up to date with the changes reported for the tree
+    def __init__(self, config):
+        self._trie = {}
+        self._by_name = {}
+        self._add(self._trie, (), _store(config))
+
+    def __len__(self):
+        return sum(len(x) for x in six.itervalues(self._by_name))
+
+    def query(self, config, pattern):
+        pattern = compile_pattern(pattern)
+
+        if pattern.name is not None:
+            candidates = list(self._by_name.get(pattern.name, ()))
+        else:
+            candidates = self._below(pattern.prefix)
+
+        return _iter_matches(config, pattern, candidates)
+
+    def update(self, config, paths):
+        for path in paths:
+            self._update(_store(config), path)
+
+    def _update(self, store, path):
+        # the ancestors of a changed path exist as long as the live tree
+        # still has them, anything at or below the path is indexed again
+        trie = self._trie
+        for index, item in enumerate(path):
+            value = _NOTHING
+            if isinstance(store, collections.Mapping):
+                value = store.get(item, _NOTHING)
+
+            if index == len(path) - 1 or value is _NOTHING:
+                self._discard(trie, path[:index + 1])
+                if value is not _NOTHING:
+                    self._add(trie, path[:index], store, only=item)
+                return
+
+            if item not in trie:
+                trie[item] = {}
+                self._name(path[:index + 1]).add(path[:index + 1])
+            trie = trie[item]
+            store = _store(value)
+
+    def _add(self, trie, path, store, only=None):
+        # index the mappings below path, store belongs to path
+        remaining = collections.deque()
+        remaining.append((trie, path, store, only))
+
+        while True:
+            try:
+                trie, path, store, only = remaining.popleft()
+            except IndexError:
+                break
+
+            if not isinstance(store, collections.Mapping):
+                continue
+
+            for k, v in six.iteritems(store):
+                if only is not None and k != only:
+                    continue
+                child_path = path + (k, )
+                self._name(child_path).add(child_path)
+                child = trie.setdefault(k, {})
+                remaining.append((child, child_path, _store(v), None))
+
+    def _discard(self, trie, path):
+        child = trie.pop(path[-1], None)
+        if child is None:
+            return
+
+        remaining = collections.deque()
+        remaining.append((path, child))
+        while True:
+            try:
+                path, child = remaining.popleft()
+            except IndexError:
+                break
+            names = self._by_name.get(path[-1], None)
+            if names is not None:
+                names.discard(path)
+                if not names:
+                    del self._by_name[path[-1]]
+            remaining.extend(
+                (path + (k, ), v) for k, v in six.iteritems(child))
+
+    def _name(self, path):
+        names = self._by_name.get(path[-1], None)
+        if names is None:
+            names = set()
+            self._by_name[path[-1]] = names
+        return names
+
+    def _below(self, prefix):
+        trie = self._trie
+        for item in prefix:
+            trie = trie.get(item, None)
+            if trie is None:
+                return []
+
+        result = []
+        remaining = collections.deque()
+        remaining.append((prefix, trie))
+        while True:
+            try:
+                path, trie = remaining.popleft()
+            except IndexError:
+                break
+            for k, v in six.iteritems(trie):
+                result.append(path + (k, ))
+                remaining.append((path + (k, ), v))
+        return result
+
+
+# marks a missing value, None is a perfectly good configuration value
+_NOTHING = object()
+
+
+def _iter_matches(config, pattern, candidates):
+    for path in candidates:
+        key = '.'.join(six.text_type(x) for x in path)
+        if not pattern.matches(key):
+            continue
+
+        # values are looked up as the iterator gets to them, paths that have
+        # gone away since are skipped
+        value = config
+        for item in path:
+            store = _store(value)
+            if not isinstance(store, collections.Mapping):
+                value = _NOTHING
+                break
+            value = store.get(item, _NOTHING)
+            if value is _NOTHING:
+                break
+        if value is not _NOTHING:
+            yield key, value
+
+
+def _store(value):
+    return getattr(value, '_internal_store', value)
+
+
+def _is_wildcard(segment):
+    return '*' in segment or '?' in segment
+
+
+def _translate(segments):
+    result = []
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == '**':
+            result.append(r'[^.]+(?:\.[^.]+)*' if last else r'(?:[^.]+\.)*')
+            continue
+
+        for character in segment:
+            if character == '*':
+                result.append(r'[^.]*')
+            elif character == '?':
+                result.append(r'[^.]')
+            else:
+                result.append(re.escape(character))
+        if not last:
+            result.append(r'\.')
+
+    return ''.join(result) + r'\Z'
@@ -0,0 +1,263 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import copy
+import random
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+import requests
+import requests.adapters
+
+from .changes import diff
+from .dictconfig import DictConfiguration
+from .loader import FileConfigSource, _load_target, _normalize_target
+from .subscriptions import SubscriptionRegistry
+
+
+DEFAULT_INTERVAL = 60
+DEFAULT_JITTER = 0.1
+# failing sources are retried at least this often, unless their interval
+# is longer
+DEFAULT_MAX_BACKOFF = 3600
+# doublings of the interval past which backing off stops growing
+MAX_BACKOFF_DOUBLINGS = 32
+DEFAULT_MAX_WORKERS = 4
+
+
+class Refresher(object):
+    # keeps a merged snapshot of many sources current, every source is
+    # reloaded on its own schedule by a few worker threads sharing one
+    # connection pool, and a new snapshot replaces the old one in one go
+    def __init__(self,
+                 targets=(),
+                 interval=DEFAULT_INTERVAL,
+                 jitter=DEFAULT_JITTER,
+                 max_backoff=DEFAULT_MAX_BACKOFF,
+                 max_workers=DEFAULT_MAX_WORKERS,
+                 include=None,
+                 exclude=None,
+                 session=None):
+        if interval <= 0:
+            raise ValueError('Refresh interval must be positive')
+        if not 0 <= jitter < 1:
+            raise ValueError('Jitter must be a fraction of the interval')
+
+        self._interval = interval
+        self._jitter = jitter
+        self._max_backoff = max_backoff
+        self._include = include
+        self._exclude = exclude
+
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self._session = session
+
+        self._entries = []
+        self._config = DictConfiguration()
+        self._subscriptions = SubscriptionRegistry()
+        self._condition = threading.Condition()
+        self._publishing = threading.Lock()
+        self._pool = ThreadPool(max_workers)
+        self._scheduler = None
+        self._stopped = False
+
+        for target in targets:
+            self.add(target)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def config(self):
+        return self._config
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def errors(self):
+        # the last error of every source that is currently failing
+        with self._condition:
+            return dict((x.target, x.error) for x in self._entries
+                        if x.error is not None)
+
+    def subscribe(self, prefix, callback):
+        # fires whenever a new snapshot changes something at the prefix
+        return self._subscriptions.subscribe(prefix, callback)
+
+    def add(self, target, interval=None):
+        # file sources are refreshed through a copy, the one given is left
+        # as it is, and the copy is returned
+        source = target
+        target = _normalize_target(target)
+        if isinstance(target, FileConfigSource):
+            target = copy.copy(target)
+            if target.session is None:
+                target.session = self._session
+            # the last good result is kept here, a stale one from the
+            # source would hide the failure and keep backoff from starting
+            target.serve_stale = False
+
+        entry = _Entry(target, source, interval or self._interval)
+        self._refresh(entry)
+        with self._condition:
+            self._entries.append(entry)
+            self._condition.notify()
+        self._publish()
+        return target
+
+    def remove(self, target):
+        with self._condition:
+            self._entries = [x for x in self._entries
+                             if x.target is not target and
+                             x.source is not target]
+        self._publish()
+
+    def refresh(self):
+        # reload everything right away, regardless of the schedule
+        with self._condition:
+            entries = list(self._entries)
+        self._pool.map(self._refresh, entries)
+        self._publish()
+
+    def start(self):
+        with self._condition:
+            if self._scheduler is not None:
+                return
+            self._stopped = False
+            self._scheduler = threading.Thread(target=self._run)
+            self._scheduler.daemon = True
+            self._scheduler.start()
+
+    def stop(self):
+        with self._condition:
+            scheduler = self._scheduler
+            self._stopped = True
+            self._scheduler = None
+            self._condition.notify()
+        if scheduler is not None:
+            scheduler.join()
+
+    def close(self):
+        self.stop()
+        self._pool.close()
+        self._pool.join()
+
+    def _run(self):
+        with self._condition:
+            while not self._stopped:
+                now = time.time()
+                waits = []
+                for entry in self._entries:
+                    if entry.busy:
+                        continue
+                    if entry.due <= now:
+                        entry.busy = True
+                        self._pool.apply_async(self._refresh_scheduled,
+                                               (entry, ))
+                    else:
+                        waits.append(entry.due - now)
+                self._condition.wait(min(waits) if waits else None)
+
+    def _refresh_scheduled(self, entry):
+        if self._refresh(entry):
+            self._publish()
+
+    def _refresh(self, entry):
+        # a failed or missing load keeps the last good result of the source
+        try:
+            config = _load_target(entry.target, self._include, self._exclude)
+            error = None
+        except Exception as e:  # pylint: disable=W0703
+            config = None
+            error = e
+
+        with self._condition:
+            entry.busy = False
+            changed = False
+            if config is None:
+                entry.failures += 1
+                entry.error = error or ValueError(
+                    'Nothing loaded from {0!s}'.format(entry.target))
+                delay = entry.interval * 2 ** min(entry.failures,
+                                                  MAX_BACKOFF_DOUBLINGS)
+                if self._max_backoff is not None:
+                    # never sooner than the regular schedule
+                    delay = min(delay,
+                                max(self._max_backoff, entry.interval))
+            else:
+                entry.failures = 0
+                entry.error = None
+                delay = entry.interval
+                changed = entry.config is None or entry.config != config
+                if changed:
+                    entry.config = config
+
+            # spread out sources that would otherwise all be due together
+            delay *= 1 + random.uniform(-self._jitter, self._jitter)
+            entry.due = time.time() + delay
+            self._condition.notify()
+        return changed
+
+    def _publish(self):
+        # one merge at a time, readers keep whatever snapshot they have
+        with self._publishing:
+            with self._condition:
+                layers = [x.config for x in self._entries
+                          if x.config is not None]
+
+            next_config = DictConfiguration()
+            for layer in layers:
+                next_config.merge(layer)
+
+            previous = self._config
+            changes = diff(previous, next_config)
+            self._config = next_config
+
+        if changes:
+            self._subscriptions.dispatch(
+                next_config,
+                [tuple(x.split('.')) for x in changes.paths])
+
+
+class _Entry(object):
+    __slots__ = ('target', 'source', 'interval', 'config', 'error',
+                 'failures', 'due', 'busy')
+
+    def __init__(self, target, source, interval):
+        self.target = target
+        # what add() was given
+        self.source = source
+        self.interval = interval
+        self.config = None
+        self.error = None
+        self.failures = 0
+        self.due = 0
+        self.busy = False
@@ -0,0 +1,314 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+
+import six
+
+from .dictconfig import DictConfiguration, fingerprint
+from .parsers import _bool
+
+
+# compiled schemas are kept around, cleared whenever this many are cached
+MAX_CACHED_SCHEMAS = 64
+
+_SCHEMAS = {}
+
+
+class SchemaError(ValueError):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super(SchemaError, self).__init__('; '.join(
+            '{0:s}: {1:s}'.format(k, m) for k, m in self.errors))
+
+
+class Field(object):
+    # a declared key, a bare type in a schema is the same as Field(type)
+    def __init__(self,
+                 kind=None,
+                 default=None,
+                 required=True,
+                 choices=None,
+                 check=None):
+        self.kind = kind
+        self.default = default
+        # a default makes a key optional, missing keys are filled in
+        self.required = required and default is None
+        self.choices = choices
+        self.check = check
+        self._coerce = _coercer(kind)
+
+    def __repr__(self):
+        return '{0:s}({1!r})'.format(self.__class__.__name__, self.kind)
+
+    def __getstate__(self):
+        # converters are rebuilt, they cannot be pickled
+        state = dict(self.__dict__)
+        del state['_coerce']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._coerce = _coercer(self.kind)
+
+    def coerce(self, value):
+        if value is None:
+            return value
+        value = self._coerce(value)
+        if self.choices is not None and value not in self.choices:
+            raise ValueError('{0!r} is not one of {1!r}'.format(
+                value, list(self.choices)))
+        if self.check is not None and not self.check(value):
+            raise ValueError('{0!r} failed its check'.format(value))
+        return value
+
+
+class Schema(object):
+    # a nested declaration compiled into a flat list of checks over dotted
+    # paths, ordered so checks sharing a prefix look it up only once
+    def __init__(self, declaration):
+        if not isinstance(declaration, collections.Mapping):
+            raise ValueError('Schema must be a mapping')
+
+        self._declaration = declaration
+        self._fields = {}
+
+        remaining = collections.deque()
+        remaining.append(((), declaration))
+        while True:
+            try:
+                path, current = remaining.popleft()
+            except IndexError:
+                break
+
+            for k, v in six.iteritems(current):
+                if not k or not isinstance(k, six.string_types):
+                    raise ValueError('Invalid schema key {0!r}'.format(k))
+                child_path = path + tuple(k.split('.'))
+                if isinstance(v, collections.Mapping):
+                    remaining.append((child_path, v))
+                    continue
+                if not isinstance(v, Field):
+                    v = Field(v)
+                self._fields[child_path] = v
+
+        self._checks = sorted(six.iteritems(self._fields))
+
+    def __repr__(self):
+        return '{0:s}({1!r})'.format(self.__class__.__name__, self.paths)
+
+    def __reduce__(self):
+        # parser options are sent to worker processes, which compile their
+        # own copy of the declaration
+        return compile_schema, (self._declaration, )
+
+    @property
+    def paths(self):
+        return ['.'.join(x) for x, _ in self._checks]
+
+    def declares(self, key):
+        return _split(key) in self._fields
+
+    def coerce(self, key, value):
+        field = self._fields.get(_split(key), None)
+        if field is None:
+            return value
+        return field.coerce(value)
+
+    def errors(self, config):
+        return self._run(config)[0]
+
+    def validate(self, config):
+        # coerce every declared key in place, nothing is changed unless
+        # everything checks out, and all problems are reported together
+        errors, updates = self._run(config)
+        if errors:
+            raise SchemaError(errors)
+
+        if updates:
+            with config.transaction() as txn:
+                for key, value in updates:
+                    txn[key] = value
+        return config
+
+    def _run(self, config):
+        config = DictConfiguration._make_dict_config(config, recurse=False)
+        # pylint: disable=W0212
+        if config._lazy is not None:
+            config._lazy.resolve(config)
+
+        errors = []
+        updates = []
+
+        # the stores along the path of the previous check
+        stores = [config._internal_store]
+        current = ()
+
+        for path, field in self._checks:
+            parent = path[:-1]
+            common = 0
+            while common < len(current) and common < len(parent) and\
+                    current[common] == parent[common]:
+                common += 1
+            del stores[common + 1:]
+            for item in parent[common:]:
+                store = stores[-1]
+                if isinstance(store, collections.Mapping):
+                    store = _store(store.get(item, None))
+                stores.append(store)
+            current = parent
+
+            key = '.'.join(path)
+            store = stores[-1]
+            value = None
+            if isinstance(store, collections.Mapping):
+                value = store.get(path[-1], None)
+            elif store is not None:
+                # something other than a mapping is in the way
+                errors.append((key, 'parent is not a mapping'))
+                continue
+
+            if value is None:
+                if field.default is not None:
+                    updates.append((key, field.default))
+                elif field.required:
+                    errors.append((key, 'missing required value'))
+                continue
+
+            try:
+                coerced = field.coerce(value)
+            except (ValueError, TypeError) as e:
+                errors.append((key, six.text_type(e)))
+                continue
+            if coerced is not value:
+                updates.append((key, coerced))
+
+        return errors, updates
+
+
+def compile_schema(declaration):
+    if isinstance(declaration, Schema):
+        return declaration
+
+    identity = fingerprint(declaration)
+    for cached, result in _SCHEMAS.get(identity, ()):
+        if cached == declaration:
+            return result
+
+    result = Schema(declaration)
+    if len(_SCHEMAS) >= MAX_CACHED_SCHEMAS:
+        _SCHEMAS.clear()
+    _SCHEMAS.setdefault(identity, []).append((declaration, result))
+    return result
+
+
+def validate(config, declaration):
+    return compile_schema(declaration).validate(config)
+
+
+def _split(key):
+    if isinstance(key, tuple):
+        return key
+    return tuple(key.split('.'))
+
+
+def _store(value):
+    if isinstance(value, DictConfiguration):
+        # pylint: disable=W0212
+        return value._internal_store
+    return value
+
+
+def _coercer(kind):
+    if kind is None or kind is object:
+        return lambda x: x
+    if isinstance(kind, list):
+        if len(kind) > 1:
+            raise ValueError('List fields take a single item type')
+        item = _coercer(kind[0] if kind else None)
+        return lambda x: _as_list(x, item)
+    if kind is bool:
+        return _as_bool
+    if kind is int:
+        return _as_int
+    if kind is float:
+        return _as_float
+    if kind in six.string_types or kind in (str, six.text_type):
+        return _as_text
+    if kind is dict:
+        return _as_mapping
+    if not isinstance(kind, type):
+        raise ValueError('Invalid field type {0!r}'.format(kind))
+    return lambda x: x if isinstance(x, kind) else kind(x)
+
+
+def _as_list(value, item):
+    if isinstance(value, six.string_types) or\
+            not isinstance(value, (list, tuple)):
+        value = [value]
+    result = [item(x) for x in value]
+    if all(x is y for x, y in six.moves.zip(result, value)) and\
+            isinstance(value, list):
+        return value
+    return result
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, six.integer_types) and value in (0, 1):
+        return bool(value)
+    return _bool(value.strip() if isinstance(value, six.string_types)
+                 else value)
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        raise ValueError('{0!r} is not an integer'.format(value))
+    if isinstance(value, six.integer_types):
+        return value
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError('{0!r} is not an integer'.format(value))
+        return int(value)
+    return int(value)
+
+
+def _as_float(value):
+    if isinstance(value, bool):
+        raise ValueError('{0!r} is not a number'.format(value))
+    if isinstance(value, float):
+        return value
+    return float(value)
+
+
+def _as_text(value):
+    if isinstance(value, six.string_types):
+        return value
+    if isinstance(value, bool) or\
+            not isinstance(value, six.integer_types + (float, )):
+        raise ValueError('{0!r} is not a string'.format(value))
+    return six.text_type(value)
+
+
+def _as_mapping(value):
+    if not isinstance(value, collections.Mapping):
+        raise ValueError('{0!r} is not a mapping'.format(value))
+    return value
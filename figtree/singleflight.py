@@ -0,0 +1,79 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import sys
+import threading
+
+import six
+
+
+class SingleFlight(object):
+    # concurrent calls for the same key share a single run of the function,
+    # everyone else waits for it and gets its result (or its exception)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, function, share=None):
+        with self._lock:
+            call = self._calls.get(key, None)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                six.reraise(*call.error)
+            return call.result if share is None else share(call.result)
+
+        try:
+            call.result = function()
+        except Exception:
+            call.error = sys.exc_info()
+            raise
+        finally:
+            # nobody can join once the call is gone, so the waiters counted
+            # here are all that will read the result
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        if call.waiters and share is not None:
+            # the original is read by the waiters, keep it untouched
+            return share(call.result)
+        return call.result
+
+
+class _Call(object):
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
@@ -0,0 +1,158 @@
+# Copyright 2016 Geoffrey MacGill
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import with_statement
+
+import collections
+import threading
+
+import six
+
+
+class Subscription(object):
+    def __init__(self, registry, path, callback):
+        self._registry = registry
+        self._path = path
+        self._callback = callback
+
+    def __repr__(self):
+        return '{0:s}({1!r}, {2!r})'.format(
+            self.__class__.__name__,
+            self.prefix,
+            self.callback)
+
+    @property
+    def prefix(self):
+        return '.'.join(self._path)
+
+    @property
+    def callback(self):
+        return self._callback
+
+    def cancel(self):
+        # pylint: disable=W0212
+        self._registry._remove(self)
+
+
+class SubscriptionRegistry(object):
+    def __init__(self):
+        self._root = _TrieNode()
+        self._count = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._count
+
+    def subscribe(self, prefix, callback):
+        if not callable(callback):
+            raise TypeError('callback is not callable')
+
+        path = _split(prefix)
+        subscription = Subscription(self, path, callback)
+
+        with self._lock:
+            node = self._root
+            for item in path:
+                child = node.children.get(item, None)
+                if child is None:
+                    child = _TrieNode()
+                    node.children[item] = child
+                node = child
+            node.subscriptions.append(subscription)
+            self._count += 1
+
+        return subscription
+
+    def dispatch(self, config, paths):
+        # a change at a.b concerns subscribers of a, a.b and of anything
+        # below a.b, everyone else is never looked at
+        matched = collections.OrderedDict()
+
+        with self._lock:
+            for path in paths:
+                node = self._root
+                self._collect(matched, node.subscriptions, path)
+                for item in path:
+                    node = node.children.get(item, None)
+                    if node is None:
+                        break
+                    self._collect(matched, node.subscriptions, path)
+                else:
+                    remaining = list(six.itervalues(node.children))
+                    while remaining:
+                        node = remaining.pop()
+                        self._collect(matched, node.subscriptions, path)
+                        remaining.extend(six.itervalues(node.children))
+
+        # call outside the lock so callbacks may subscribe or cancel
+        for subscription, changed in six.iteritems(matched):
+            subscription.callback(config, sorted(changed))
+
+    def _collect(self, matched, subscriptions, path):
+        if not subscriptions:
+            return
+        dotted = '.'.join(path)
+        for subscription in subscriptions:
+            changed = matched.get(subscription, None)
+            if changed is None:
+                changed = set()
+                matched[subscription] = changed
+            changed.add(dotted)
+
+    def _remove(self, subscription):
+        # pylint: disable=W0212
+        path = subscription._path
+        with self._lock:
+            trail = []
+            node = self._root
+            for item in path:
+                trail.append((node, item))
+                node = node.children.get(item, None)
+                if node is None:
+                    return
+            try:
+                node.subscriptions.remove(subscription)
+            except ValueError:
+                return
+            self._count -= 1
+
+            # drop branches that no longer lead anywhere
+            for parent, item in reversed(trail):
+                child = parent.children[item]
+                if child.subscriptions or child.children:
+                    break
+                del parent.children[item]
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'subscriptions')
+
+    def __init__(self):
+        self.children = {}
+        self.subscriptions = []
+
+
+def _split(prefix):
+    if not prefix:
+        return ()
+    if not isinstance(prefix, six.string_types):
+        raise TypeError('prefix is not a string')
+    result = tuple(prefix.split('.'))
+    if not all(result):
+        raise KeyError('empty key segement in path')
+    return result
@@ -39,6 +39,27 @@ child_bc = c
 TEST_DATA_FULL_INI = TEST_DATA_A_INI + TEST_DATA_B_INI
 
 
+TEST_DATA_A_TOML = '''
+[parent_a]
+child_aa = 1
+child_ab = 2
+'''
+
+
+TEST_DATA_B_TOML = '''
+[parent_b]
+child_bb = 5
+child_bc = ["a", "b", "c"]
+
+[parent_b.child_ba]
+grand_child_baa = 3
+grand_child_bab = 4
+'''
+
+
+TEST_DATA_FULL_TOML = TEST_DATA_A_TOML + TEST_DATA_B_TOML
+
+
 TEST_DATA_FULL = {
     'parent_a': {
         'child_aa': 1,
@@ -75,6 +96,15 @@ TestDataItem = collections.namedtuple(
     ])
 
 
+@pytest.fixture(autouse=True)
+def forget_remotes():
+    from figtree.loader import _REMOTES
+
+    # breakers and last good results are kept per URL for the process,
+    # tests reuse URLs and must not see each other's
+    _REMOTES.clear()
+
+
 @pytest.fixture(scope='session')
 def config_set(tmpdir_factory, request):
     from figtree import FileConfigSource, ObjectConfigSource
@@ -306,3 +336,65 @@ def _make_confs_json(hint):
             parsed=testdata_b))
 
     return confs
+
+
+def _make_confs_toml(hint):
+    from figtree import LiteralConfigSource
+    from figtree.parsers import tomllib
+
+    if tomllib is None:
+        pytest.skip('TOML support requires tomllib or tomli')
+
+    testdata_a = copy.deepcopy(TEST_DATA_FULL)
+    testdata_a.pop('parent_b')
+    testdata_b = copy.deepcopy(TEST_DATA_FULL)
+    testdata_b.pop('parent_a')
+
+    confs = TestDataSource(
+        full=TestDataItem(
+            source=LiteralConfigSource(
+                TEST_DATA_FULL_TOML,
+                hint=hint),
+            parsed=copy.deepcopy(TEST_DATA_FULL)),
+        a=TestDataItem(
+            source=LiteralConfigSource(
+                TEST_DATA_A_TOML,
+                hint=hint),
+            parsed=testdata_a),
+        b=TestDataItem(
+            source=LiteralConfigSource(
+                TEST_DATA_B_TOML,
+                hint=hint),
+            parsed=testdata_b))
+
+    return confs
+
+
+def _make_confs_msgpack(hint):
+    from figtree import LiteralConfigSource
+
+    msgpack = pytest.importorskip('msgpack')
+
+    testdata_a = copy.deepcopy(TEST_DATA_FULL)
+    testdata_a.pop('parent_b')
+    testdata_b = copy.deepcopy(TEST_DATA_FULL)
+    testdata_b.pop('parent_a')
+
+    confs = TestDataSource(
+        full=TestDataItem(
+            source=LiteralConfigSource(
+                msgpack.packb(TEST_DATA_FULL, use_bin_type=True),
+                hint=hint),
+            parsed=copy.deepcopy(TEST_DATA_FULL)),
+        a=TestDataItem(
+            source=LiteralConfigSource(
+                msgpack.packb(testdata_a, use_bin_type=True),
+                hint=hint),
+            parsed=testdata_a),
+        b=TestDataItem(
+            source=LiteralConfigSource(
+                msgpack.packb(testdata_b, use_bin_type=True),
+                hint=hint),
+            parsed=testdata_b))
+
+    return confs
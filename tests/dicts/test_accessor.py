@@ -0,0 +1,72 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'db': {'primary': {'host': 'a', 'port': 1}},
+        'feature': {'x': True}
+    })
+
+
+def test_get_many():
+    conf = _make_config()
+
+    result = conf.get_many(
+        ['db.primary.host', 'db.primary.port', 'db.primary.user',
+         'feature.x', 'feature.x.y', 'missing.key'],
+        defaults={'db.primary.user': 'root'})
+
+    assert_that(result).is_equal_to(['a', 1, 'root', True, None, None])
+
+
+def test_accessor():
+    conf = _make_config()
+    port = conf.accessor('db.primary.port')
+    user = conf.accessor('db.primary.user', default='root')
+
+    assert_that(port()).is_equal_to(1)
+    assert_that(user.get()).is_equal_to('root')
+    assert_that(user.get('admin')).is_equal_to('admin')
+
+    conf['db.primary.port'] = 2
+    conf['db.primary.user'] = 'app'
+    assert_that(port()).is_equal_to(2)
+    assert_that(user()).is_equal_to('app')
+
+
+@pytest.mark.parametrize('change', [
+    lambda c: c.merge({'db': {'primary': {'port': 3}}}),
+    lambda c: c.update({'db': {'primary': {'port': 3}}}),
+    lambda c: c.__setitem__('db.primary', {'port': 3}),
+    lambda c: c['db'].__setitem__('primary', {'port': 3}),
+])
+def test_accessor_restructured(change):
+    conf = _make_config()
+    port = conf.accessor('db.primary.port')
+    assert_that(port()).is_equal_to(1)
+
+    change(conf)
+    assert_that(port()).is_equal_to(3)
+
+
+def test_accessor_removed():
+    conf = _make_config()
+    port = conf.accessor('db.primary.port', default=0)
+    assert_that(port()).is_equal_to(1)
+
+    del conf['db.primary']
+    assert_that(port()).is_equal_to(0)
+
+    with conf.transaction() as txn:
+        txn['db.primary.port'] = 4
+    assert_that(port()).is_equal_to(4)
+
+
+@pytest.mark.xfail(raises=KeyError)
+def test_accessor_invalid_key():
+    conf = _make_config()
+    conf.accessor('db..port')
@@ -0,0 +1,83 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def test_diff_identical():
+    from figtree import diff
+    from figtree.dictconfig import DictConfiguration
+
+    old = DictConfiguration({'a': {'b': 1, 'c': [1, 2]}, 'd': 'e'})
+    new = DictConfiguration({'a': {'b': 1, 'c': [1, 2]}, 'd': 'e'})
+
+    result = diff(old, new)
+
+    assert_that(bool(result)).is_false()
+    assert_that(result.paths).is_empty()
+
+
+def test_diff_changes():
+    from figtree import diff
+    from figtree.dictconfig import DictConfiguration
+
+    old = DictConfiguration({
+        'db': {
+            'primary': {'host': 'a', 'port': 1},
+            'replica': {'host': 'b', 'port': 1},
+            'pool': 5
+        },
+        'cache': {'size': 10},
+        'flag': True
+    })
+    new = DictConfiguration({
+        'db': {
+            'primary': {'host': 'a', 'port': 2},
+            'replica': {'host': 'b', 'port': 1},
+            'pool': {'min': 1, 'max': 5},
+            'timeout': 3
+        },
+        'flag': True,
+        'extra': {'x': 1}
+    })
+
+    result = diff(old, new)
+
+    assert_that(result.added).is_equal_to(['db.timeout', 'extra'])
+    assert_that(result.removed).is_equal_to(['cache'])
+    assert_that(result.changed).is_equal_to(['db.pool', 'db.primary.port'])
+
+
+@pytest.mark.parametrize('old,new,expected',
+                         [
+                             ({'a': [1]}, {'a': (1, )}, 'a'),
+                             ({'a': {'b': [1]}}, {'a': {'b': (1, )}}, 'a.b'),
+                             ({'a': None}, {'a': {}}, 'a'),
+                             # hash(-1) == hash(-2), digests must not collide
+                             ({'a': {'x': -1}}, {'a': {'x': -2}}, 'a.x'),
+                         ])
+def test_diff_type_changes(old, new, expected):
+    from figtree import diff
+
+    assert_that(diff(old, new).changed).is_equal_to([expected])
+
+
+@pytest.mark.xfail(raises=ValueError)
+def test_diff_non_mapping():
+    from figtree import diff
+
+    diff({'a': 1}, [1])
+
+
+def test_diff_configurations():
+    from figtree import diff
+    from figtree.dictconfig import DictConfiguration
+
+    old = DictConfiguration({'a': {'x': -1}, 'b': {'y': [1, 2]}})
+    new = DictConfiguration({'a': {'x': -2}, 'b': {'y': [1, 2]}})
+
+    assert_that(diff(old, new).changed).is_equal_to(['a.x'])
+
+    new['a.x'] = -1
+    new['b.y'].append(3)
+
+    assert_that(diff(old, new).changed).is_equal_to(['b.y'])
@@ -0,0 +1,106 @@
+import pytest
+from assertpy import assert_that
+
+
+def _make_pair():
+    from figtree.dictconfig import DictConfiguration
+
+    data = {
+        'db': {'host': 'a', 'port': 1, 'replicas': ['b', 'c']},
+        'cache': {'size': 10}
+    }
+    return DictConfiguration(data), DictConfiguration(data)
+
+
+def test_fingerprint_equal():
+    one, two = _make_pair()
+
+    assert_that(one.fingerprint()).is_equal_to(two.fingerprint())
+    assert_that(one['db'].fingerprint()).is_equal_to(
+        two['db'].fingerprint())
+    assert_that(one['db'].fingerprint()).is_not_equal_to(
+        one['cache'].fingerprint())
+
+
+def test_fingerprint_nested_set():
+    one, two = _make_pair()
+    before = one.fingerprint()
+    cache = one['cache'].fingerprint()
+
+    # change through a child node, the root must notice
+    one['db']['port'] = 2
+
+    assert_that(one.fingerprint()).is_not_equal_to(before)
+    assert_that(one['cache'].fingerprint()).is_equal_to(cache)
+    assert_that(one).is_not_equal_to(two)
+
+    one['db.port'] = 1
+
+    assert_that(one.fingerprint()).is_equal_to(before)
+    assert_that(one).is_equal_to(two)
+
+
+def test_fingerprint_delete_and_merge():
+    one, two = _make_pair()
+    before = one.fingerprint()
+
+    del one['db.host']
+    assert_that(one.fingerprint()).is_not_equal_to(before)
+
+    one.merge({'db': {'host': 'a'}})
+    assert_that(one.fingerprint()).is_equal_to(before)
+
+    one.merge({'cache': {'ttl': 5}})
+    assert_that(one.fingerprint()).is_not_equal_to(two.fingerprint())
+
+
+def test_fingerprint_detached_child():
+    one, _ = _make_pair()
+    child = one['db']
+    del one['db']
+    before = one.fingerprint()
+
+    # the removed subtree no longer belongs to the configuration
+    child['port'] = 5
+
+    assert_that(one.fingerprint()).is_equal_to(before)
+
+
+def test_equal_after_leaf_changed_in_place():
+    from figtree.dictconfig import DictConfiguration
+
+    one = DictConfiguration({'s': {'l': [1]}})
+    two = DictConfiguration({'s': {'l': [1, 2]}})
+    assert_that(one).is_not_equal_to(two)
+
+    # leaf lists are not watched, equality must not trust the cache
+    one['s.l'].append(2)
+
+    assert_that(one).is_equal_to(two)
+
+
+@pytest.mark.parametrize('one,two,equal',
+                         [
+                             # hash(-1) == hash(-2)
+                             ({'a': -1}, {'a': -2}, False),
+                             ({'a': {'b': -1}}, {'a': {'b': -2}}, False),
+                             ({'a': 1, 'b': 2}, {'a': 2, 'b': 1}, False),
+                             ({'a': 1}, {'a': 1.0}, True),
+                             ({'a': 1}, {'a': True}, True),
+                             ({'a': 1}, {'a': '1'}, False),
+                             ({'a': [1]}, {'a': (1, )}, False),
+                             ({'a': ['b', 'c']}, {'a': ['bc']}, False),
+                             ({'a': {'b': 1}}, {'a.b': 1}, True),
+                         ])
+def test_fingerprint_digest(one, two, equal):
+    from figtree.dictconfig import DictConfiguration, fingerprint
+
+    # plain mappings digest the same as configurations
+    assert_that(fingerprint(one)).is_equal_to(
+        DictConfiguration(one).fingerprint())
+
+    one = DictConfiguration(one)
+    two = DictConfiguration(two)
+
+    assert_that(one.fingerprint() == two.fingerprint()).is_equal_to(equal)
+    assert_that(one == two).is_equal_to(equal)
@@ -0,0 +1,86 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'db': {'primary': {'host': 'a', 'port': 1}, 'options': {}},
+        'feature': {'x': True, 'list': [1, {'a': 2}]},
+        'name': 'test'
+    })
+
+
+def test_flat_items():
+    conf = _make_config()
+
+    assert_that(dict(conf.flat_items())).is_equal_to({
+        'db.primary.host': 'a',
+        'db.primary.port': 1,
+        'db.options': {},
+        'feature.x': True,
+        'feature.list': [1, {'a': 2}],
+        'name': 'test'
+    })
+    assert_that(sorted(conf.iter_flat())).is_equal_to(
+        sorted(conf.to_flat_dict().keys()))
+
+
+def test_flat_items_order():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration()
+    conf['a.b'] = 1
+    conf['a.c.d'] = 2
+    conf['a.e'] = 3
+    conf['f'] = 4
+
+    assert_that(list(conf.iter_flat())).is_equal_to(
+        ['a.b', 'a.c.d', 'a.e', 'f'])
+
+
+def test_flat_items_deep():
+    from figtree.dictconfig import DictConfiguration
+
+    key = '.'.join(['k'] * 5000)
+    conf = DictConfiguration.from_flat({key: 1})
+
+    assert_that(conf.to_flat_dict()).is_equal_to({key: 1})
+
+
+def test_from_flat():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = _make_config()
+    result = DictConfiguration.from_flat(conf.to_flat_dict())
+
+    assert_that(result).is_equal_to(conf)
+    assert_that(result['db.options']).is_instance_of(DictConfiguration)
+    assert_that(result['db.primary']._parent).is_same_as(result['db'])
+
+
+@pytest.mark.parametrize('items,expected', [
+    ([('a', 1), ('a.b', 2)], {'a': {'b': 2}}),
+    ([('a.b', 2), ('a', 1)], {'a': 1}),
+    ([('a.b', 2), ('a', 1), ('a.c', 3)], {'a': {'c': 3}}),
+    ([('a', {'b': 1}), ('a.c', 2)], {'a': {'b': 1, 'c': 2}}),
+    ([('a', {'b.c': 1})], {'a': {'b': {'c': 1}}}),
+])
+def test_from_flat_matches_setitem(items, expected):
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration()
+    for k, v in items:
+        conf[k] = v
+
+    assert_that(conf).is_equal_to(expected)
+    assert_that(DictConfiguration.from_flat(items)).is_equal_to(expected)
+
+
+@pytest.mark.xfail(raises=KeyError)
+def test_from_flat_invalid_key():
+    from figtree.dictconfig import DictConfiguration
+
+    DictConfiguration.from_flat({'a..b': 1})
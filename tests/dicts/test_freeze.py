@@ -0,0 +1,73 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'db': {'host': 'a', 'port': 1},
+        'cache': {'size': 10}
+    })
+
+
+def test_freeze():
+    conf = _make_config()
+
+    assert_that(conf.freeze()).is_same_as(conf)
+    assert_that(conf.frozen).is_true()
+    assert_that(conf['db'].frozen).is_true()
+    assert_that(conf['db.port']).is_equal_to(1)
+
+    copied = conf.copy()
+    copied['db.port'] = 2
+    assert_that(copied.frozen).is_false()
+    assert_that(conf['db.port']).is_equal_to(1)
+
+
+def _set(conf):
+    conf['db.port'] = 2
+
+
+def _set_child(conf):
+    conf['db']['port'] = 2
+
+
+def _delete(conf):
+    del conf['cache']
+
+
+def _merge(conf):
+    conf.merge({'db': {'port': 2}})
+
+
+def _update(conf):
+    conf.update({'a': 1})
+
+
+def _transaction(conf):
+    conf.transaction()
+
+
+CHANGES = {
+    'set': _set,
+    'set_child': _set_child,
+    'delete': _delete,
+    'merge': _merge,
+    'update': _update,
+    'transaction': _transaction
+}
+
+
+@pytest.mark.parametrize('change', [
+    pytest.mark.xfail('set', raises=TypeError),
+    pytest.mark.xfail('set_child', raises=TypeError),
+    pytest.mark.xfail('delete', raises=TypeError),
+    pytest.mark.xfail('merge', raises=TypeError),
+    pytest.mark.xfail('update', raises=TypeError),
+    pytest.mark.xfail('transaction', raises=TypeError),
+])
+def test_freeze_write(change):
+    conf = _make_config().freeze()
+    CHANGES[change](conf)
@@ -0,0 +1,98 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config(**kwargs):
+    from figtree.dictconfig import DictConfiguration
+
+    values = {
+        'db': {'host': 'localhost', 'port': 5432},
+        'url': 'postgres://${db.host}:${db.port}/${ENV:DB_NAME}',
+        'port': '${db.port}',
+        'backup': {'url': '${url}/backup'},
+        'literal': '$${db.host}'
+    }
+    values.update(kwargs)
+    return DictConfiguration(values)
+
+
+def test_interpolate():
+    from figtree import Interpolator
+
+    conf = _make_config()
+    Interpolator(conf, environ={'DB_NAME': 'app'})
+
+    assert_that(conf['url']).is_equal_to('postgres://localhost:5432/app')
+    assert_that(conf['backup.url']).is_equal_to(
+        'postgres://localhost:5432/app/backup')
+    # a plain reference keeps the type of the value it points to
+    assert_that(conf['port']).is_equal_to(5432)
+    assert_that(conf['literal']).is_equal_to('${db.host}')
+
+
+def test_interpolate_updates_dependents():
+    from figtree import Interpolator
+
+    conf = _make_config(other='${db.host}')
+    interpolator = Interpolator(conf, environ={'DB_NAME': 'app'})
+    calls = []
+    conf.subscribe('backup', lambda c, p: calls.append(p))
+
+    conf['db.port'] = 6543
+
+    assert_that(conf['port']).is_equal_to(6543)
+    assert_that(conf['backup.url']).is_equal_to(
+        'postgres://localhost:6543/app/backup')
+    assert_that(conf['other']).is_equal_to('localhost')
+    assert_that(calls).is_equal_to([['backup.url']])
+
+    # new templates are picked up, replaced ones are dropped
+    conf['name'] = 'remote'
+    conf['db'] = {'host': '${name}', 'port': 1}
+    assert_that(conf['url']).is_equal_to('postgres://remote:1/app')
+    conf['name'] = 'other'
+    assert_that(conf['backup.url']).is_equal_to(
+        'postgres://other:1/app/backup')
+    conf['url'] = 'sqlite://'
+    assert_that(conf['backup.url']).is_equal_to('sqlite:///backup')
+
+    interpolator.close()
+    conf['db.port'] = 2
+    assert_that(conf['port']).is_equal_to(1)
+
+
+def test_interpolate_resolves_once():
+    from figtree import Interpolator
+
+    class Environ(dict):
+        reads = 0
+
+        def __getitem__(self, key):
+            Environ.reads += 1
+            return dict.__getitem__(self, key)
+
+    conf = _make_config()
+    for x in range(100):
+        conf['copies.c{0:d}'.format(x)] = '${url}'
+
+    Interpolator(conf, environ=Environ(DB_NAME='app'))
+
+    assert_that(Environ.reads).is_equal_to(1)
+    assert_that(conf['copies.c99']).is_equal_to(conf['url'])
+
+
+@pytest.mark.parametrize('values,error', [
+    ({'a': '${b}', 'b': '${c}', 'c': '${a}'}, ValueError),
+    ({'a': '${a}'}, ValueError),
+    ({'a': '${missing.key}'}, KeyError),
+    ({'a': '${ENV:MISSING}'}, KeyError),
+    ({'a': '${db}'}, ValueError),
+    ({'a': '${db..host}'}, ValueError),
+])
+def test_interpolate_errors(values, error):
+    from figtree import Interpolator
+
+    conf = _make_config(**values)
+    with pytest.raises(error):
+        Interpolator(conf, environ={'DB_NAME': 'app'})
@@ -168,6 +168,52 @@ def test_merge_duplicate_keys_with_different_types():
     assert_that(first['three']).contains_entry({'three_a': '3a'})
 
 
+def test_merge_other_configuration():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration({'a': 1})
+    other = DictConfiguration({'db': {'x': 1}})
+    calls = []
+    other.subscribe('db', lambda config, paths: calls.append(paths))
+    before = other.fingerprint()
+    other.query('**.y')
+
+    conf.merge(other)
+    other['db.y'] = 3
+
+    # the merged nodes are copies, other still owns its own
+    assert_that(other.fingerprint()).is_not_equal_to(before)
+    assert_that(list(other.query('**.y'))).is_length(1)
+    assert_that(calls).is_length(1)
+    assert_that(conf['db']).is_equal_to({'x': 1})
+
+
+def test_merge_reports_once():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration({'db': {'x': 1}, 'c': 1})
+    calls = []
+    conf.subscribe('', lambda config, paths: calls.append(sorted(paths)))
+    conf['db'].fingerprint()
+
+    conf.merge({'db': {'y': 2}, 'c': 2, 'd': {'e': 3}})
+
+    assert_that(calls).is_equal_to([['c', 'd', 'db.y']])
+    assert_that(conf['db'].fingerprint()).is_equal_to(
+        DictConfiguration({'x': 1, 'y': 2}).fingerprint())
+
+
+def test_set_attached_node():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration({'a': {'x': 1}})
+    conf['b'] = conf['a']
+    conf['b.x'] = 2
+
+    assert_that(conf['a.x']).is_equal_to(1)
+    assert_that(conf['b.x']).is_equal_to(2)
+
+
 @pytest.mark.xfail(raises=ValueError)
 def test_merge_non_mapping():
     from figtree.dictconfig import DictConfiguration
@@ -0,0 +1,125 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'services': {
+            'web': {'timeout': 10, 'enabled': True},
+            'worker': {'timeout': 20, 'enabled': False,
+                       'queue': {'enabled': True}}
+        },
+        'enabled': True,
+        'timeout': 5
+    })
+
+
+@pytest.mark.parametrize('pattern,expected', [
+    ('services.*.timeout', {'services.web.timeout': 10,
+                            'services.worker.timeout': 20}),
+    ('**.enabled', {'enabled': True,
+                    'services.web.enabled': True,
+                    'services.worker.enabled': False,
+                    'services.worker.queue.enabled': True}),
+    ('services.**.enabled', {'services.web.enabled': True,
+                             'services.worker.enabled': False,
+                             'services.worker.queue.enabled': True}),
+    ('services.w?b.*', {'services.web.timeout': 10,
+                        'services.web.enabled': True}),
+    ('timeout', {'timeout': 5}),
+    ('services.missing.*', {}),
+])
+def test_query(pattern, expected):
+    conf = _make_config()
+    assert_that(dict(conf.query(pattern))).is_equal_to(expected)
+
+
+def test_query_keys():
+    conf = _make_config()
+
+    assert_that(sorted(k for k, _ in conf.query('services.w*'))).is_equal_to(
+        ['services.web', 'services.worker'])
+    assert_that(dict(conf.query('services.w*'))['services.web'])\
+        .is_same_as(conf['services.web'])
+    assert_that(sorted(k for k, _ in conf.query('*'))).is_equal_to(
+        ['enabled', 'services', 'timeout'])
+    assert_that(sorted(k for k, _ in conf.query('**'))).is_length(11)
+
+
+def test_query_is_lazy():
+    conf = _make_config()
+    result = conf.query('**.timeout')
+
+    assert_that(hasattr(result, '__next__') or hasattr(result, 'next'))\
+        .is_true()
+
+
+def test_query_index_updates():
+    conf = _make_config()
+    assert_that(dict(conf.query('**.timeout'))).is_length(3)
+
+    conf['services.db.timeout'] = 30
+    del conf['services.web']
+    conf['services.worker.queue'] = 1
+    conf['services']['cache'] = {'timeout': 40}
+
+    assert_that(dict(conf.query('**.timeout'))).is_equal_to({
+        'timeout': 5,
+        'services.worker.timeout': 20,
+        'services.db.timeout': 30,
+        'services.cache.timeout': 40
+    })
+    assert_that(dict(conf.query('**.enabled'))).is_equal_to({
+        'enabled': True,
+        'services.worker.enabled': False
+    })
+
+    with conf.transaction() as txn:
+        txn['services.web.enabled'] = True
+        del txn['services.db']
+        txn['services.cache'] = 1
+
+    assert_that(dict(conf.query('services.*.*'))).is_equal_to({
+        'services.web.enabled': True,
+        'services.worker.timeout': 20,
+        'services.worker.enabled': False,
+        'services.worker.queue': 1
+    })
+
+
+def test_query_index_matches_rebuild():
+    import random
+
+    from figtree.dictconfig import DictConfiguration
+
+    rand = random.Random(7)
+    conf = _make_config()
+    conf.query('**')
+    keys = ['a', 'b', 'c']
+
+    for _ in range(500):
+        key = '.'.join(rand.choice(keys)
+                       for _ in range(rand.randint(1, 3)))
+        if rand.random() < 0.3:
+            try:
+                del conf[key]
+            except KeyError:
+                pass
+        elif rand.random() < 0.5:
+            conf[key] = {'c': rand.randint(0, 3)}
+        else:
+            conf[key] = rand.randint(0, 3)
+
+        rebuilt = DictConfiguration(conf.copy())
+        assert_that(sorted(k for k, _ in conf.query('**'))).is_equal_to(
+            sorted(k for k, _ in rebuilt.query('**')))
+
+
+@pytest.mark.parametrize('pattern', ['', 'a..b', None])
+def test_query_invalid(pattern):
+    conf = _make_config()
+    with pytest.raises(ValueError):
+        conf.query(pattern)
@@ -0,0 +1,117 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_schema():
+    from figtree import Field
+
+    return {
+        'db': {
+            'host': str,
+            'port': Field(int, default=5432),
+            'timeout': float,
+            'mode': Field(str, choices=['ro', 'rw'], required=False)
+        },
+        'debug': bool,
+        'tags': [str],
+        'workers': Field(int, check=lambda x: x > 0, required=False)
+    }
+
+
+def _make_config(**kwargs):
+    from figtree.dictconfig import DictConfiguration
+
+    values = {
+        'db': {'host': 'localhost', 'timeout': '2.5'},
+        'debug': 'yes',
+        'tags': 'one',
+        'other': '1'
+    }
+    values.update(kwargs)
+    return DictConfiguration(values)
+
+
+def test_validate():
+    from figtree import validate
+
+    conf = _make_config()
+    validate(conf, _make_schema())
+
+    assert_that(conf).is_equal_to({
+        'db': {'host': 'localhost', 'port': 5432, 'timeout': 2.5},
+        'debug': True,
+        'tags': ['one'],
+        'other': '1'
+    })
+
+
+@pytest.mark.parametrize('kind,value,expected', [
+    (int, '12', 12),
+    (int, 12.0, 12),
+    (float, '1e3', 1000.0),
+    (float, 3, 3.0),
+    (bool, 'Off', False),
+    (bool, 1, True),
+    (str, 12, '12'),
+    ([int], ('1', 2), [1, 2]),
+    ([int], '7', [7]),
+    (dict, {'a': 1}, {'a': 1}),
+])
+def test_coerce(kind, value, expected):
+    from figtree import Schema
+
+    schema = Schema({'key': kind})
+    result = schema.coerce('key', value)
+
+    assert_that(result).is_equal_to(expected)
+    assert_that(type(result)).is_equal_to(type(expected))
+
+
+def test_validate_errors():
+    from figtree import validate, SchemaError
+
+    conf = _make_config(debug='maybe', workers=0, db={'port': 'x',
+                                                      'mode': 'rw'})
+    before = conf.copy()
+
+    with pytest.raises(SchemaError) as error:
+        validate(conf, _make_schema())
+
+    # every problem is reported, and nothing is changed
+    assert_that([x[0] for x in error.value.errors]).contains_only(
+        'db.host', 'db.port', 'db.timeout', 'debug', 'workers')
+    assert_that(conf).is_equal_to(before)
+
+
+def test_validate_parent_not_mapping():
+    from figtree import compile_schema
+
+    conf = _make_config(db='sqlite')
+
+    errors = compile_schema(_make_schema()).errors(conf)
+    assert_that(errors).contains(('db.host', 'parent is not a mapping'))
+
+
+def test_compile_schema_cached():
+    from figtree import compile_schema
+
+    first = compile_schema({'a': {'b': int}, 'c': [str]})
+    second = compile_schema({'c': [str], 'a': {'b': int}})
+
+    assert_that(first).is_same_as(second)
+    assert_that(first.paths).is_equal_to(['a.b', 'c'])
+    assert_that(compile_schema(first)).is_same_as(first)
+
+
+@pytest.mark.parametrize('declaration', [
+    {'a': 'int'},
+    {'a': [int, str]},
+    {'': int},
+    [int],
+])
+def test_invalid_schema(declaration):
+    from figtree import Schema
+
+    with pytest.raises(ValueError):
+        Schema(declaration)
@@ -0,0 +1,77 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'db': {'primary': {'host': 'a', 'port': 1}},
+        'feature': {'x': True, 'y': False}
+    })
+
+
+def test_subscribe_prefix():
+    conf = _make_config()
+    calls = []
+
+    conf.subscribe('db.primary', lambda c, p: calls.append(('primary', p)))
+    conf.subscribe('db', lambda c, p: calls.append(('db', p)))
+    conf.subscribe('feature', lambda c, p: calls.append(('feature', p)))
+
+    conf['db.primary.port'] = 2
+
+    assert_that(calls).contains_only(
+        ('primary', ['db.primary.port']),
+        ('db', ['db.primary.port']))
+
+
+def test_subscribe_replaced_parent():
+    conf = _make_config()
+    calls = []
+
+    conf.subscribe('db.primary.host', lambda c, p: calls.append(p))
+
+    # replacing an ancestor touches everything below it
+    conf['db'] = {'primary': {'host': 'b'}}
+    del conf['db.primary']
+
+    assert_that(calls).is_equal_to([['db'], ['db.primary']])
+
+
+def test_subscribe_child_mutation():
+    conf = _make_config()
+    calls = []
+
+    conf.subscribe(None, lambda c, p: calls.append((c, p)))
+    primary = conf['db.primary']
+    primary['port'] = 3
+
+    assert_that(calls).is_length(1)
+    assert_that(calls[0][0]).is_same_as(conf)
+    assert_that(calls[0][1]).is_equal_to(['db.primary.port'])
+
+
+def test_subscribe_cancel():
+    conf = _make_config()
+    calls = []
+
+    subscriptions = [
+        conf.subscribe('feature.{0:d}'.format(x),
+                       lambda c, p: calls.append(p))
+        for x in range(1000)]
+    handle = conf.subscribe('feature.x', lambda c, p: calls.append(p))
+
+    conf['feature.x'] = False
+    handle.cancel()
+    conf['feature.x'] = True
+
+    assert_that(calls).is_equal_to([['feature.x']])
+    assert_that(subscriptions[0].prefix).is_equal_to('feature.0')
+
+
+@pytest.mark.xfail(raises=TypeError)
+def test_subscribe_not_callable():
+    conf = _make_config()
+    conf.subscribe('db', None)
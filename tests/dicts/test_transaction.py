@@ -0,0 +1,143 @@
+import pytest
+
+from assertpy import assert_that
+
+
+def _make_config():
+    from figtree.dictconfig import DictConfiguration
+
+    return DictConfiguration({
+        'db': {'primary': {'host': 'a', 'port': 1}},
+        'feature': {'x': True, 'y': False}
+    })
+
+
+def test_transaction_commit():
+    conf = _make_config()
+    primary = conf['db.primary']
+
+    with conf.transaction() as txn:
+        txn['db.primary.port'] = 2
+        txn['db.replica.host'] = 'b'
+        txn.update({'feature.z': True, 'cache': {'size': 10}})
+        del txn['feature.y']
+
+        # nothing is visible until the transaction commits
+        assert_that(conf['db.primary.port']).is_equal_to(1)
+        assert_that(conf).does_not_contain_key('cache')
+        assert_that(txn['db.primary.port']).is_equal_to(2)
+
+    assert_that(conf).is_equal_to({
+        'db': {'primary': {'host': 'a', 'port': 2},
+               'replica': {'host': 'b'}},
+        'feature': {'x': True, 'z': True},
+        'cache': {'size': 10}
+    })
+    # nodes along written paths are replaced, the old ones keep the old state
+    assert_that(primary['port']).is_equal_to(1)
+    assert_that(conf['db.primary']['port']).is_equal_to(2)
+
+
+def test_transaction_rollback():
+    conf = _make_config()
+    before = conf.copy()
+
+    with pytest.raises(ValueError):
+        with conf.transaction() as txn:
+            txn['db.primary.port'] = 2
+            del txn['feature']
+            raise ValueError()
+
+    assert_that(conf).is_equal_to(before)
+
+
+def test_transaction_single_notification():
+    conf = _make_config()
+    calls = []
+
+    conf.subscribe('db', lambda c, p: calls.append(('db', p)))
+    conf['db.primary'].subscribe('port', lambda c, p: calls.append(
+        ('port', p)))
+
+    with conf.transaction() as txn:
+        for x in range(10):
+            txn['db.primary.port'] = x
+        txn['feature.x'] = False
+
+    assert_that(calls).contains_only(
+        ('port', ['port']),
+        ('db', ['db.primary.port']))
+
+    # subscriptions follow the node that replaced the original
+    conf['db.primary.port'] = 100
+    assert_that(calls[-2:]).contains_only(
+        ('port', ['port']),
+        ('db', ['db.primary.port']))
+
+
+def test_transaction_fingerprint():
+    conf = _make_config()
+    other = _make_config()
+    other['db.primary.port'] = 5
+    conf.fingerprint()
+
+    with conf.transaction() as txn:
+        txn['db.primary.port'] = 5
+
+    assert_that(conf.fingerprint()).is_equal_to(other.fingerprint())
+
+    # later changes through replaced nodes still reach the root
+    conf['db.primary']['port'] = 6
+    assert_that(conf.fingerprint()).is_not_equal_to(other.fingerprint())
+
+
+def test_transaction_nested_node():
+    conf = _make_config()
+
+    with conf['db'].transaction() as txn:
+        txn['primary.port'] = 2
+
+    assert_that(conf['db.primary.port']).is_equal_to(2)
+
+
+@pytest.mark.xfail(raises=KeyError)
+def test_transaction_delete_missing():
+    conf = _make_config()
+    with conf.transaction() as txn:
+        del txn['db.secondary.host']
+
+
+@pytest.mark.xfail(raises=RuntimeError)
+def test_transaction_closed():
+    conf = _make_config()
+    with conf.transaction() as txn:
+        txn['feature.x'] = False
+    txn['feature.x'] = True
+
+
+@pytest.mark.parametrize('key', ['cache', 'db.primary.port'])
+def test_transaction_direct_write(key):
+    conf = _make_config()
+    txn = conf.transaction()
+    txn['db.primary.host'] = 'b'
+
+    # would be undone by the commit, which refuses instead
+    conf[key] = 'direct'
+
+    with pytest.raises(RuntimeError):
+        txn.commit()
+    assert_that(conf[key]).is_equal_to('direct')
+    assert_that(conf['db.primary.host']).is_equal_to('a')
+
+
+def test_transaction_direct_write_kept():
+    conf = _make_config()
+    txn = conf.transaction()
+    txn['db.primary.host'] = 'b'
+
+    # nodes the transaction did not copy are shared, nothing is undone
+    conf['feature.x'] = False
+    txn.commit()
+
+    assert_that(conf['feature.x']).is_false()
+    assert_that(conf['db.primary.host']).is_equal_to('b')
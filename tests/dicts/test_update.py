@@ -71,6 +71,45 @@ def test_update_overwrite_with_mapping():
     assert_that(conf['two']).is_type_of(DictConfiguration)
 
 
+def test_update_nested():
+    from figtree.dictconfig import DictConfiguration
+
+    conf = DictConfiguration({
+        'a': {'b': {'c': 1}, 'd.e': 2},
+        'f': [1, 2]
+    })
+    calls = []
+    conf.subscribe('', lambda config, paths: calls.append(paths))
+
+    conf.update({'a': {'x': 1}, 'g.h': 3}, i=4)
+
+    # plain keys are reported together, dotted ones as they are set
+    assert_that(calls).is_length(2)
+    assert_that(sorted(sum(calls, []))).is_equal_to(['a', 'g.h', 'i'])
+    assert_that(conf.fingerprint()).is_equal_to(
+        DictConfiguration({
+            'a': {'x': 1},
+            'f': [1, 2],
+            'g': {'h': 3},
+            'i': 4
+        }).fingerprint())
+    # nodes built while updating know their place in the tree
+    conf['a.x'] = 2
+    assert_that(calls[-1]).is_equal_to(['a.x'])
+
+
+def test_update_with_configuration():
+    from figtree.dictconfig import DictConfiguration
+
+    other = DictConfiguration({'a': {'b': 1}})
+    conf = DictConfiguration(other)
+    conf['a.b'] = 2
+
+    # the nodes of other stay with it
+    assert_that(other['a.b']).is_equal_to(1)
+    assert_that(other).is_not_equal_to(conf)
+
+
 def test_delete_key():
     from figtree.dictconfig import DictConfiguration
 
@@ -1,4 +1,5 @@
 import collections
+import os
 
 import pytest
 import responses
@@ -24,6 +25,12 @@ from .utils import ConfigParams
                             ConfigParams('ini', None, 'filename', None),
                             ConfigParams('ini', None, 'file', None),
                             ConfigParams('ini', None, 'literal', None),
+                            ConfigParams('toml', None, 'filename', None),
+                            ConfigParams('toml', None, 'file', None),
+                            ConfigParams('toml', None, 'literal', None),
+                            ConfigParams('msgpack', None, 'filename', None),
+                            ConfigParams('msgpack', None, 'file', None),
+                            ConfigParams('msgpack', None, 'literal', None),
                             ConfigParams(None, None, 'object', None),
 
                             # unknown hints (try any)
@@ -35,6 +42,10 @@ from .utils import ConfigParams
                             ConfigParams('json', None, 'file', 'xyz'),
                             ConfigParams('ini', None, 'filename', 'xyz'),
                             ConfigParams('ini', None, 'file', 'xyz'),
+                            ConfigParams('toml', None, 'filename', 'xyz'),
+                            ConfigParams('toml', None, 'file', 'xyz'),
+                            ConfigParams('msgpack', None, 'filename', 'xyz'),
+                            ConfigParams('msgpack', None, 'file', 'xyz'),
                          ],
                          indirect=['config_set'])
 def test_load_and_merge_local_file(config_set):
@@ -66,6 +77,12 @@ def test_load_and_merge_local_file(config_set):
                             ConfigParams('ini', None, 'filename', None),
                             ConfigParams('ini', None, 'file', None),
                             ConfigParams('ini', None, 'literal', None),
+                            ConfigParams('toml', None, 'filename', None),
+                            ConfigParams('toml', None, 'file', None),
+                            ConfigParams('toml', None, 'literal', None),
+                            ConfigParams('msgpack', None, 'filename', None),
+                            ConfigParams('msgpack', None, 'file', None),
+                            ConfigParams('msgpack', None, 'literal', None),
                             ConfigParams(None, None, 'object', None),
 
                             # unknown hints (try any)
@@ -77,6 +94,10 @@ def test_load_and_merge_local_file(config_set):
                             ConfigParams('json', None, 'file', 'xyz'),
                             ConfigParams('ini', None, 'filename', 'xyz'),
                             ConfigParams('ini', None, 'file', 'xyz'),
+                            ConfigParams('toml', None, 'filename', 'xyz'),
+                            ConfigParams('toml', None, 'file', 'xyz'),
+                            ConfigParams('msgpack', None, 'filename', 'xyz'),
+                            ConfigParams('msgpack', None, 'file', 'xyz'),
                          ],
                          indirect=['config_set'])
 def test_load_first_local_file(config_set):
@@ -110,6 +131,12 @@ def test_load_first_local_file(config_set):
                             ConfigParams('ini', None, 'filename', None),
                             ConfigParams('ini', None, 'file', None),
                             ConfigParams('ini', None, 'literal', None),
+                            ConfigParams('toml', None, 'filename', None),
+                            ConfigParams('toml', None, 'file', None),
+                            ConfigParams('toml', None, 'literal', None),
+                            ConfigParams('msgpack', None, 'filename', None),
+                            ConfigParams('msgpack', None, 'file', None),
+                            ConfigParams('msgpack', None, 'literal', None),
                             ConfigParams(None, None, 'object', None),
 
                             # unknown hints (try any)
@@ -121,6 +148,10 @@ def test_load_first_local_file(config_set):
                             ConfigParams('json', None, 'file', 'xyz'),
                             ConfigParams('ini', None, 'filename', 'xyz'),
                             ConfigParams('ini', None, 'file', 'xyz'),
+                            ConfigParams('toml', None, 'filename', 'xyz'),
+                            ConfigParams('toml', None, 'file', 'xyz'),
+                            ConfigParams('msgpack', None, 'filename', 'xyz'),
+                            ConfigParams('msgpack', None, 'file', 'xyz'),
                          ],
                          indirect=['config_set'])
 def test_load_local_file(config_set):
@@ -279,6 +310,10 @@ def test_load_none_source():
                                 ConfigParams('ini', None, 'literal', None),
                                 'ini'
                             ),
+                            (
+                                ConfigParams('msgpack', None, 'literal', None),
+                                'msgpack'
+                            ),
                          ],
                          indirect=['config_set'])
 def test_load_remote_http_with_content_type(config_set, encoding):
@@ -325,6 +360,10 @@ def test_load_remote_http_with_content_type(config_set, encoding):
                                 ConfigParams('ini', None, 'literal', None),
                                 'ini'
                             ),
+                            (
+                                ConfigParams('msgpack', None, 'literal', None),
+                                'msgpack'
+                            ),
                          ],
                          indirect=['config_set'])
 def test_load_remote_http_with_extension(config_set, encoding):
@@ -374,3 +413,1399 @@ def test_load_remote_http_error(config_set, encoding):
         # ensure parsed correctly
         assert_that(conf).is_length(0)
         assert_that(conf).is_equal_to({})
+
+
+@pytest.mark.parametrize('extension,content,expected',
+                         [
+                             ('json', b'{"a": {"b": 1}}', {'a': {'b': 1}}),
+                             ('xml', b'<c><a><b>1</b></a></c>',
+                              {'a': {'b': 1}}),
+                             ('yml', b'a:\n  b: 1\n', {'a': {'b': 1}}),
+                             ('ini', b'[a]\nb = 1\n', {'a': {'b': 1}}),
+                             ('xyz', b'[a]\nb = 1\n', {'a': {'b': 1}}),
+                             ('xyz', b'', {}),
+                         ])
+def test_load_local_file_bytes(tmpdir, extension, content, expected):
+    from figtree import FileConfigSource
+
+    path = tmpdir.join('config.{0:s}'.format(extension))
+    path.write_binary(content)
+
+    conf = FileConfigSource(str(path)).load()
+
+    assert_that(conf).is_equal_to(expected)
+
+
+@pytest.mark.parametrize('compression,name',
+                         [
+                             ('gzip', 'config.json.gz'),
+                             ('gzip', 'config.yml.gz'),
+                             ('gzip', 'config.ini.gz'),
+                             ('gzip', 'config.xyz'),
+                             ('xz', 'config.xml.xz'),
+                             ('xz', 'config.json'),
+                         ])
+def test_load_local_file_compressed(tmpdir, compression, name):
+    import gzip
+    import lzma
+    from figtree import FileConfigSource
+
+    content = {
+        'json': b'{"a": {"b": 1}}',
+        'yml': b'a:\n  b: 1\n',
+        'ini': b'[a]\nb = 1\n',
+        'xyz': b'[a]\nb = 1\n',
+        'xml': b'<c><a><b>1</b></a></c>',
+    }[name.split('.')[1]]
+    compress = gzip.compress if compression == 'gzip' else lzma.compress
+
+    path = tmpdir.join(name)
+    path.write_binary(compress(content))
+
+    conf = FileConfigSource(str(path)).load()
+
+    assert_that(conf).is_equal_to({'a': {'b': 1}})
+
+
+def test_load_local_file_compressed_streamed(tmpdir, monkeypatch):
+    import gzip
+    from figtree import FileConfigSource
+    from figtree.parsers import Parser
+
+    path = tmpdir.join('config.yml.gz')
+    path.write_binary(gzip.compress(b'a:\n  b: 1\n'))
+    source = FileConfigSource(str(path))
+
+    assert_that(source.hint).is_equal_to('yaml')
+    assert_that(source.compression).is_equal_to('gzip')
+
+    loaded = []
+    original = Parser.load.__func__
+
+    def load(cls, data, source, key_filter=None):
+        loaded.append(data)
+        return original(cls, data, source, key_filter)
+    monkeypatch.setattr(Parser, 'load', classmethod(load))
+
+    assert_that(source.load()).is_equal_to({'a': {'b': 1}})
+    assert_that(loaded[0]).is_instance_of(gzip.GzipFile)
+
+
+def test_load_local_file_encoding(tmpdir):
+    from figtree import FileConfigSource
+
+    path = tmpdir.join('config.json')
+    path.write_binary(u'{"a": "\u00e9"}'.encode('latin-1'))
+
+    conf = FileConfigSource(str(path), encoding='latin-1').load()
+
+    assert_that(conf).is_equal_to({'a': u'\u00e9'})
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, None])
+@pytest.mark.parametrize('disposition', ['literal', 'file'])
+def test_load_json_stream(tmpdir, disposition, chunk_size):
+    from figtree import load_config, FileConfigSource, LiteralConfigSource
+    from .conftest import TEST_DATA_FULL
+
+    try:
+        import simplejson as json
+    except ImportError:
+        import json
+
+    options = {'stream': True, 'chunk_size': chunk_size}
+    content = json.dumps(TEST_DATA_FULL)
+    if disposition == 'literal':
+        source = LiteralConfigSource(content,
+                                     hint='json',
+                                     parser_options=options)
+    else:
+        path = tmpdir.join('config.json')
+        path.write(content)
+        source = FileConfigSource(str(path), parser_options=options)
+
+    conf = load_config(source)
+
+    assert_that(conf).is_equal_to(TEST_DATA_FULL)
+
+
+@pytest.mark.parametrize('prefixes,expected',
+                         [
+                             (['parent_a'], {'parent_a': {'child_aa': 1,
+                                                          'child_ab': 2}}),
+                             (['parent_b.child_ba.grand_child_bab',
+                               'parent_b.child_bb'],
+                              {'parent_b': {'child_ba': {'grand_child_bab': 4},
+                                            'child_bb': 5}}),
+                             (['parent_c'], {}),
+                         ])
+def test_load_json_stream_prefixes(prefixes, expected):
+    from figtree.jsonstream import load_json_stream
+    from .conftest import TEST_DATA_FULL
+
+    try:
+        import simplejson as json
+    except ImportError:
+        import json
+
+    conf = load_json_stream(json.dumps(TEST_DATA_FULL),
+                            prefixes=prefixes,
+                            chunk_size=3)
+
+    assert_that(conf).is_equal_to(expected)
+
+
+@pytest.mark.parametrize('test_input',
+                         [
+                             '{"a": 1',
+                             '{"a": {"b": "c}',
+                             '{"a": 1} {}',
+                             '[1, 2]',
+                         ])
+def test_load_json_stream_invalid(test_input):
+    from figtree.jsonstream import load_json_stream
+
+    with pytest.raises(ValueError):
+        load_json_stream(test_input, chunk_size=2)
+
+
+@pytest.mark.parametrize('config_set',
+                         [
+                            ConfigParams('xml', None, 'filename', None),
+                            ConfigParams('xml', None, 'literal', None),
+                            ConfigParams('yaml', None, 'filename', None),
+                            ConfigParams('yaml', None, 'literal', None),
+                            ConfigParams('json', None, 'filename', None),
+                            ConfigParams('json', None, 'literal', None),
+                            ConfigParams('ini', None, 'filename', None),
+                            ConfigParams('ini', None, 'literal', None),
+                            ConfigParams('toml', None, 'filename', None),
+                            ConfigParams('toml', None, 'file', None),
+                            ConfigParams('toml', None, 'literal', None),
+                            ConfigParams('msgpack', None, 'filename', None),
+                            ConfigParams('msgpack', None, 'file', None),
+                            ConfigParams('msgpack', None, 'literal', None),
+                            ConfigParams(None, None, 'object', None),
+                            ConfigParams('json', None, 'filename', 'xyz'),
+                            ConfigParams('ini', None, 'filename', 'xyz'),
+                         ],
+                         indirect=['config_set'])
+@pytest.mark.parametrize('include,exclude,expected',
+                         [
+                             (['parent_a'], None,
+                              {'parent_a': {'child_aa': 1, 'child_ab': 2}}),
+                             (None, ['parent_a', 'parent_b.child_bc'],
+                              {'parent_b': {'child_ba': {
+                                                'grand_child_baa': 3,
+                                                'grand_child_bab': 4},
+                                            'child_bb': 5}}),
+                             (['parent_b.child_ba', 'parent_a.child_aa'],
+                              ['parent_b.child_ba.grand_child_bab'],
+                              {'parent_a': {'child_aa': 1},
+                               'parent_b': {'child_ba': {
+                                                'grand_child_baa': 3}}}),
+                             (['parent_c'], None, {}),
+                         ])
+def test_load_filtered(config_set, include, exclude, expected):
+    from figtree import load_config
+
+    conf = load_config(
+        (
+            config_set.a.source,
+            config_set.b.source
+        ),
+        include=include,
+        exclude=exclude)
+
+    assert_that(conf).is_equal_to(expected)
+
+
+def test_load_lazy_source(tmpdir):
+    from figtree import load_config, LazyConfigSource, ObjectConfigSource
+
+    loaded = []
+
+    class CountingSource(ObjectConfigSource):
+        def load(self, include=None, exclude=None):
+            loaded.append(self.source)
+            return super(CountingSource, self).load(include, exclude)
+
+    conf = load_config(
+        (
+            {'a': {'b': 1}, 'c': {'d': 1}},
+            LazyConfigSource(CountingSource({'a': {'b': 2, 'e': 2},
+                                             'c': {'d': 2}}),
+                             prefixes=['a']),
+            {'a': {'e': 3}},
+            LazyConfigSource(str(tmpdir.join('missing.json')))
+        ))
+
+    assert_that(loaded).is_empty()
+    assert_that(conf['c.d']).is_equal_to(1)
+    assert_that(loaded).is_empty()
+    assert_that(conf['a.b']).is_equal_to(2)
+    assert_that(loaded).is_length(1)
+    assert_that(conf).is_equal_to({'a': {'b': 2, 'e': 3}, 'c': {'d': 1}})
+
+
+def test_load_lazy_source_threads():
+    import threading
+    import time
+    from figtree import load_config, LazyConfigSource, ObjectConfigSource
+
+    loaded = []
+
+    class SlowSource(ObjectConfigSource):
+        def load(self, include=None, exclude=None):
+            loaded.append(self.source)
+            time.sleep(0.1)
+            return super(SlowSource, self).load(include, exclude)
+
+    conf = load_config(
+        (
+            {'a': 1},
+            LazyConfigSource(SlowSource({'db': {'x': 1}}), prefixes=['db']),
+        ))
+
+    results = []
+    errors = []
+
+    def read():
+        try:
+            results.append(conf['db.x'])
+        except Exception as e:  # pylint: disable=W0703
+            errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # nobody reads the tree while the deferred layer is merged into it
+    assert_that(errors).is_empty()
+    assert_that(results).is_equal_to([1, 1, 1, 1])
+    assert_that(loaded).is_length(1)
+
+
+def test_load_lazy_source_matches_eager():
+    from figtree import load_config, LazyConfigSource
+
+    layers = (
+        {'a': {'b': {'c': 1}}, 'd': 1},
+        {'a': {'b': 2}, 'e': {'f': 1}},
+        {'a': {'b': {'g': 3}}, 'd': {'h': 1}},
+    )
+
+    eager = load_config(layers)
+    lazy = load_config([LazyConfigSource(x) for x in layers])
+
+    assert_that(lazy).is_equal_to(eager)
+
+
+@pytest.mark.parametrize('parallel', [None, 4])
+def test_load_first_found_skips_missing(tmpdir, parallel):
+    from figtree import load_first_found_config
+
+    found = tmpdir.join('found.json')
+    found.write('{"a": 1}')
+    other = tmpdir.join('other.json')
+    other.write('{"b": 1}')
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.HEAD, url, status=404)
+
+        conf = load_first_found_config(
+            (
+                str(tmpdir.join('missing.json')),
+                url,
+                None,
+                str(found),
+                str(other)
+            ),
+            parallel=parallel)
+
+        # the missing url was only probed, never fetched
+        assert_that(requests_mock.calls).is_length(1)
+
+    assert_that(conf).is_equal_to({'a': 1})
+
+
+def test_load_first_found_none():
+    from figtree import load_first_found_config
+
+    conf = load_first_found_config(('@/does/not/exist.yml', None))
+
+    assert_that(conf).is_equal_to({})
+
+
+def test_reloading_config(tmpdir):
+    from figtree import ReloadingConfig
+
+    path = tmpdir.join('config.json')
+    path.write('{"db": {"host": "a"}, "cache": {"size": 1}}')
+
+    container = ReloadingConfig(str(path))
+    calls = []
+    container.subscribe('db', lambda c, p: calls.append(p))
+
+    path.write('{"db": {"host": "a"}, "cache": {"size": 2}}')
+    changes = container.reload()
+
+    assert_that(changes.changed).is_equal_to(['cache.size'])
+    assert_that(calls).is_empty()
+
+    path.write('{"db": {"host": "b"}, "cache": {"size": 2}}')
+    container.reload()
+
+    assert_that(calls).is_equal_to([['db.host']])
+    assert_that(container.config['db.host']).is_equal_to('b')
+
+    # local changes to the current snapshot notify as well
+    container.config['db.port'] = 5
+    assert_that(calls[-1]).is_equal_to(['db.port'])
+
+
+def test_reloading_config_accessor(tmpdir):
+    from figtree import ReloadingConfig
+
+    path = tmpdir.join('config.json')
+    path.write('{"db": {"host": "a"}}')
+
+    container = ReloadingConfig(str(path))
+    host = container.accessor('db.host')
+    assert_that(host()).is_equal_to('a')
+
+    path.write('{"db": {"host": "b"}}')
+    container.reload()
+    assert_that(host()).is_equal_to('b')
+
+
+def test_load_interpolated(monkeypatch):
+    import figtree
+
+    monkeypatch.setenv('FIGTREE_TEST_USER', 'admin')
+    conf = figtree.load_config(
+        [{'db': {'host': 'a', 'user': '${ENV:FIGTREE_TEST_USER}'}},
+         {'url': '${db.user}@${db.host}'}],
+        interpolate=True)
+
+    assert_that(conf['url']).is_equal_to('admin@a')
+
+
+def test_load_ini_schema():
+    import figtree
+
+    schema = figtree.compile_schema({
+        'section': {'zip': str, 'flag': str, 'count': int}})
+    source = figtree.LiteralConfigSource(
+        '[section]\nzip = 01234\nflag = yes\ncount = 010\nother = 010\n',
+        hint='ini',
+        parser_options={'schema': schema})
+
+    conf = figtree.load_config(source, schema=schema)
+
+    assert_that(conf['section']).is_equal_to({
+        'zip': '01234', 'flag': 'yes', 'count': 10, 'other': 10})
+
+
+@pytest.mark.parametrize('offload', [None, 1])
+def test_load_schema_parses_declared(tmpdir, offload):
+    import figtree
+
+    path = tmpdir.join('config.ini')
+    path.write('[a]\nb = 007\nc = yes\nd = 007\n')
+    source = figtree.FileConfigSource(str(path))
+
+    conf = figtree.load_config(source,
+                               schema={'a': {'b': str, 'c': str}},
+                               offload_threshold=offload)
+
+    # declared keys are never guessed at, the rest still are
+    assert_that(conf['a']).is_equal_to({'b': '007', 'c': 'yes', 'd': 7})
+    # the source keeps its own options
+    assert_that(source.parser_options).is_empty()
+
+
+def test_load_schema_error():
+    import figtree
+
+    with pytest.raises(figtree.SchemaError):
+        figtree.load_config({'a': 'x'}, schema={'a': int, 'b': str})
+
+
+def test_load_env_source():
+    import figtree
+
+    environ = {
+        'APP__DB__POOL_SIZE': '10',
+        'APP__DB__HOST': 'localhost',
+        'APP__DEBUG': 'yes',
+        'APP__NAME': 'app',
+        'APP__NAME__FULL': 'application',
+        'APP____BROKEN': 'x',
+        'APPLICATION': 'no',
+        'OTHER__DB__HOST': 'no'
+    }
+    source = figtree.EnvConfigSource('APP', environ=environ)
+
+    conf = figtree.load_config(({'db': {'user': 'root'}}, source))
+
+    assert_that(source.exists()).is_true()
+    assert_that(conf).is_equal_to({
+        'db': {'user': 'root', 'pool_size': 10, 'host': 'localhost'},
+        'debug': True,
+        'name': {'full': 'application'}
+    })
+
+    conf = figtree.load_config(source, include=['db'], exclude=['db.host'])
+    assert_that(conf).is_equal_to({'db': {'pool_size': 10}})
+
+
+def test_load_env_source_snapshot():
+    import figtree
+
+    environ = {'APP_DB_HOST': 'a'}
+    source = figtree.EnvConfigSource('APP',
+                                     separator='_',
+                                     environ=environ,
+                                     lowercase=False)
+
+    first = source.load()
+    first['DB.HOST'] = 'changed'
+    assert_that(source.load()).is_equal_to({'DB': {'HOST': 'a'}})
+
+    environ['APP_DB_PORT'] = '1'
+    assert_that(source.load()).is_equal_to({'DB': {'HOST': 'a', 'PORT': 1}})
+    assert_that(figtree.EnvConfigSource('NONE').exists()).is_false()
+
+
+def _write_fragments(tmpdir):
+    conf_d = tmpdir.mkdir('conf.d')
+    conf_d.join('10-base.yml').write('db:\n  host: a\n  port: 1\n')
+    conf_d.join('20-override.json').write('{"db": {"host": "b"}}')
+    conf_d.join('30-extra.ini').write('[cache]\nsize = 10\n')
+    conf_d.join('README').write('not a fragment')
+    conf_d.mkdir('nested.yml')
+    return conf_d
+
+
+def test_load_directory_source(tmpdir):
+    import figtree
+
+    conf_d = _write_fragments(tmpdir)
+    source = figtree.DirectoryConfigSource(str(conf_d))
+
+    assert_that([os.path.basename(x) for x in source.paths]).is_equal_to(
+        ['10-base.yml', '20-override.json', '30-extra.ini'])
+    assert_that(figtree.load_config(source)).is_equal_to({
+        'db': {'host': 'b', 'port': 1},
+        'cache': {'size': 10}
+    })
+
+    glob_source = figtree.DirectoryConfigSource(str(conf_d.join('*.yml')))
+    assert_that(figtree.load_config(glob_source)).is_equal_to({
+        'db': {'host': 'a', 'port': 1}})
+    assert_that(figtree.DirectoryConfigSource(
+        str(tmpdir.join('missing'))).exists()).is_false()
+
+
+def test_load_directory_source_cached(tmpdir, monkeypatch):
+    import figtree
+    import figtree.loader
+
+    conf_d = _write_fragments(tmpdir)
+    source = figtree.DirectoryConfigSource(str(conf_d))
+    loaded = []
+    original = figtree.loader._load_fragment
+
+    def _load_fragment(job):
+        loaded.append(os.path.basename(job[0]))
+        return original(job)
+
+    monkeypatch.setattr(figtree.loader, '_load_fragment', _load_fragment)
+
+    first = source.load()
+    first['db.host'] = 'changed'
+    assert_that(loaded).is_length(3)
+
+    fragment = conf_d.join('20-override.json')
+    fragment.write('{"db": {"host": "c", "user": "x"}}')
+    os.utime(str(fragment), (0, 0))
+    conf_d.join('30-extra.ini').remove()
+
+    second = source.load()
+    assert_that(loaded[3:]).is_equal_to(['20-override.json'])
+    assert_that(second).is_equal_to({
+        'db': {'host': 'c', 'port': 1, 'user': 'x'}})
+
+
+def test_load_directory_source_parallel(tmpdir):
+    import figtree
+
+    conf_d = tmpdir.mkdir('conf.d')
+    for x in range(8):
+        conf_d.join('{0:02d}.json'.format(x)).write(
+            '{{"values": {{"v{0:d}": {0:d}}}, "last": {0:d}}}'.format(x))
+
+    source = figtree.DirectoryConfigSource(str(conf_d),
+                                           processes=2,
+                                           parallel_threshold=4)
+    conf = figtree.load_config(source)
+
+    assert_that(conf['last']).is_equal_to(7)
+    assert_that(conf['values']).is_length(8)
+    assert_that(conf['values']._parent).is_same_as(conf)
+
+
+def test_load_offloaded(tmpdir):
+    import figtree
+
+    large = tmpdir.join('large.yml')
+    large.write('\n'.join('key{0:d}:\n  value: {0:d}'.format(x)
+                          for x in range(1000)))
+    small = tmpdir.join('small.json')
+    small.write('{"key1": {"value": "override"}}')
+
+    targets = (str(large), str(small))
+    conf = figtree.load_config(targets, offload_threshold=1024)
+
+    assert_that(conf).is_equal_to(figtree.load_config(targets))
+    assert_that(conf['key1.value']).is_equal_to('override')
+    assert_that(conf['key999']._parent).is_same_as(conf)
+
+
+def test_load_offloaded_during_load(tmpdir, monkeypatch):
+    import os
+    import threading
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": {"b": 1}}')
+
+    parent = os.getpid()
+    started = threading.Event()
+    release = threading.Event()
+    original = figtree.FileConfigSource._load_file
+
+    def slow_load(self, key_filter=None):
+        if os.getpid() == parent:
+            started.set()
+            release.wait(5)
+        return original(self, key_filter)
+    monkeypatch.setattr(figtree.FileConfigSource, '_load_file', slow_load)
+
+    thread = threading.Thread(target=figtree.load_config, args=(str(path), ))
+    thread.start()
+    assert_that(started.wait(5)).is_true()
+    try:
+        # the worker is forked while the same file is loading in a thread
+        conf = figtree.load_config(str(path), offload_threshold=1)
+    finally:
+        release.set()
+        thread.join()
+
+    assert_that(conf).is_equal_to({'a': {'b': 1}})
+
+
+def test_load_toml_filtered():
+    import figtree
+    from figtree.parsers import tomllib
+
+    if tomllib is None:
+        pytest.skip('TOML support requires tomllib or tomli')
+
+    source = figtree.LiteralConfigSource(
+        '"a.b" = 1\n[c]\nd = 2\ne = 3\n[f]\ng = 4\n',
+        hint='toml')
+
+    conf = figtree.load_config(source, include=['a', 'c'], exclude=['c.e'])
+
+    assert_that(conf).is_equal_to({'a': {'b': 1}, 'c': {'d': 2}})
+    assert_that(conf['c']._parent).is_same_as(conf)
+
+
+def test_dump_msgpack(tmpdir):
+    import figtree
+
+    pytest.importorskip('msgpack')
+
+    conf = figtree.load_config(figtree.ObjectConfigSource(
+        {'a': {'b': 1, 'c': [1, 'two']}, 'd': {'e': {'f': None}}}))
+
+    packed = figtree.dump_msgpack(conf)
+    assert_that(packed).is_instance_of(six.binary_type)
+
+    path = tmpdir.join('config.msgpack')
+    with path.open('wb') as outstream:
+        figtree.dump_msgpack(conf, outstream)
+
+    loaded = figtree.load_config('@' + str(path))
+    assert_that(loaded).is_equal_to(conf)
+    assert_that(loaded['d.e']._parent._parent).is_same_as(loaded)
+    assert_that(figtree.load_config(figtree.LiteralConfigSource(
+        packed, hint='msgpack'), include=['d'])).is_equal_to(
+            {'d': {'e': {'f': None}}})
+
+
+def test_dump_msgpack_lazy():
+    import figtree
+
+    pytest.importorskip('msgpack')
+
+    conf = figtree.load_config([
+        {'a': 1},
+        figtree.LazyConfigSource({'b': {'c': 2}}, prefixes='b')])
+    packed = figtree.dump_msgpack(conf)
+
+    # layers waiting for a lookup are packed too
+    assert_that(figtree.load_config(figtree.LiteralConfigSource(
+        packed, hint='msgpack'))).is_equal_to({'a': 1, 'b': {'c': 2}})
+
+
+@pytest.mark.xfail(raises=ValueError)
+def test_load_msgpack_not_a_map():
+    import figtree
+
+    msgpack = pytest.importorskip('msgpack')
+
+    figtree.load_config(figtree.LiteralConfigSource(
+        msgpack.packb([1, 2, 3]), hint='msgpack'))
+
+
+@pytest.mark.parametrize('url,content_type',
+                         [
+                             ('http://doesnotexist.localdomain/config.json.gz',
+                              'application/x-testtestest'),
+                             ('http://doesnotexist.localdomain/config.json',
+                              'application/gzip'),
+                             ('http://doesnotexist.localdomain/config.json',
+                              'application/json'),
+                         ])
+def test_load_remote_http_compressed(url, content_type):
+    import gzip
+    from figtree import load_config, FileConfigSource
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET,
+                          url,
+                          body=gzip.compress(b'{"a": {"b": 1}}'),
+                          status=200,
+                          content_type=content_type)
+
+        conf = load_config(FileConfigSource(url))
+
+        assert_that(conf).is_equal_to({'a': {'b': 1}})
+        assert_that(requests_mock.calls[0].request.headers).contains_entry(
+            {'Accept-Encoding': 'gzip, deflate'})
+
+
+def test_load_coalesced(tmpdir, monkeypatch):
+    import threading
+    import time
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": {"b": 1}}')
+
+    loads = []
+    original = figtree.FileConfigSource._load_file
+
+    def slow_load(self, key_filter=None):
+        loads.append(self.source)
+        time.sleep(0.2)
+        return original(self, key_filter)
+    monkeypatch.setattr(figtree.FileConfigSource, '_load_file', slow_load)
+
+    results = []
+
+    def load(target):
+        results.append(figtree.load_config(target))
+
+    threads = [threading.Thread(target=load, args=(x, ))
+               for x in [str(path)] * 8 + ['@' + str(path)] * 8]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_that(loads).is_length(1)
+    assert_that(results).is_length(16)
+    for conf in results:
+        assert_that(conf).is_equal_to({'a': {'b': 1}})
+        assert_that(conf['a']._parent).is_same_as(conf)
+    # every caller gets a tree of its own
+    assert_that(set(id(x['a']) for x in results)).is_length(16)
+
+    # later loads are not served from the finished one
+    figtree.load_config(str(path))
+    assert_that(loads).is_length(2)
+
+
+@pytest.mark.parametrize('options',
+                         [
+                             {'timeout': 5},
+                             {'stream': True},
+                             {'max_size': 1024},
+                             {'serve_stale': False},
+                             {'breaker': (1, 30)},
+                             {'session': None},
+                         ])
+def test_load_coalesced_remote_settings(options):
+    import requests
+    from figtree import FileConfigSource
+    from figtree.breaker import CircuitBreaker
+    from figtree.loader import _source_identity
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    shared = {'session': requests.Session()}
+
+    # breakers of the same settings are interchangeable
+    one = FileConfigSource(url, **shared)
+    two = FileConfigSource(url, breaker=CircuitBreaker(), **shared)
+    assert_that(_source_identity(one)).is_equal_to(_source_identity(two))
+
+    shared.update(options)
+    if 'breaker' in options:
+        shared['breaker'] = CircuitBreaker(*options['breaker'])
+    other = FileConfigSource(url, **shared)
+    assert_that(_source_identity(one)).is_not_equal_to(
+        _source_identity(other))
+
+
+def test_load_coalesced_remote():
+    import threading
+    import time
+    import figtree
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    def slow(request):
+        time.sleep(0.2)
+        return (200, {'content-type': 'application/json'}, '{"a": 1}')
+
+    results = []
+
+    def load():
+        results.append(figtree.load_config(url))
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add_callback(responses.GET, url, callback=slow)
+
+        threads = [threading.Thread(target=load) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # plain URLs, a new source for every call and one request for all
+        assert_that(requests_mock.calls).is_length(1)
+
+    assert_that(results).is_length(5)
+    for conf in results:
+        assert_that(conf).is_equal_to({'a': 1})
+
+
+def test_load_coalesced_error():
+    import threading
+    from figtree.singleflight import SingleFlight
+
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError('broken')
+
+    def call(function):
+        try:
+            flights.do('key', function)
+        except ValueError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call, args=(fail, ))
+    leader.start()
+    started.wait()
+    waiter = threading.Thread(target=call, args=(lambda: 1, ))
+    waiter.start()
+    while not flights._calls['key'].waiters:
+        threading.Event().wait(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+
+    assert_that(errors).is_length(2)
+    assert_that(errors[0]).is_same_as(errors[1])
+    assert_that(flights).is_length(0)
+
+
+def test_load_cached(tmpdir):
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": {"b": 1}}')
+    targets = (str(path), {'c': 2}, figtree.LiteralConfigSource(
+        'd: 3', hint='yaml'))
+
+    cache = figtree.LoadCache()
+    first = figtree.load_config(targets, cache=cache)
+    second = figtree.load_config(targets, cache=cache)
+
+    assert_that(cache.misses).is_equal_to(1)
+    assert_that(cache.hits).is_equal_to(1)
+    assert_that(second).is_equal_to({'a': {'b': 1}, 'c': 2, 'd': 3})
+    # one frozen result shared by everyone
+    assert_that(second).is_same_as(first)
+    assert_that(second.frozen).is_true()
+    assert_that(second['a'].frozen).is_true()
+
+    # writing takes a copy
+    conf = second.copy()
+    conf['a.b'] = 100
+    assert_that(conf.frozen).is_false()
+    assert_that(figtree.load_config(targets, cache=cache)['a.b']).is_equal_to(
+        1)
+
+    # a schema changes how sources are parsed, so it is a different key
+    conf = figtree.load_config(targets, cache=cache, schema={'a.b': int})
+    assert_that(conf.frozen).is_false()
+    assert_that(conf).is_not_same_as(second)
+    assert_that(cache.misses).is_equal_to(2)
+
+    # a changed source is a different key
+    path.write('{"a": {"b": 2, "x": 0}}')
+    conf = figtree.load_config(targets, cache=cache)
+    assert_that(conf['a.b']).is_equal_to(2)
+    assert_that(figtree.load_config(
+        (str(path), {'c': 4}), cache=cache)['c']).is_equal_to(4)
+    assert_that(cache.hits).is_equal_to(2)
+    assert_that(cache.misses).is_equal_to(4)
+
+    # uncacheable sources always load
+    lazy = (str(path), figtree.LazyConfigSource({'e': 5}, prefixes='e'))
+    figtree.load_config(lazy, cache=cache)
+    figtree.load_config(lazy, cache=cache)
+    assert_that(cache.hits).is_equal_to(2)
+
+
+def test_load_cached_remote():
+    import figtree
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    cache = figtree.LoadCache()
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.HEAD, url, status=200,
+                          adding_headers={'ETag': '"1"'})
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json',
+                          adding_headers={'ETag': '"1"'})
+
+        first = figtree.load_config(url, cache=cache)
+        second = figtree.load_config(url, cache=cache)
+
+        # a new source every call, the same version of the same URL
+        assert_that(second).is_same_as(first)
+        assert_that(cache.hits).is_equal_to(1)
+        assert_that([x.request.method for x in requests_mock.calls])\
+            .is_equal_to(['HEAD', 'GET', 'HEAD'])
+
+
+@pytest.mark.parametrize('one,two',
+                         [
+                             ({'a': -1}, {'a': -2}),
+                             ({'a': 1}, {'a': True}),
+                             ({'a': 1}, {'a': 1.0}),
+                             ({'a': [1]}, {'a': (1, )}),
+                         ])
+def test_load_cached_objects_exact(one, two):
+    import figtree
+
+    cache = figtree.LoadCache()
+    figtree.load_config(one, cache=cache)
+    figtree.load_config(two, cache=cache)
+
+    # content that hashes or compares alike is still another source
+    assert_that(cache.hits).is_equal_to(0)
+    assert_that(cache.misses).is_equal_to(2)
+
+
+def test_load_cached_invalidate(tmpdir):
+    import figtree
+
+    first = tmpdir.join('first.json')
+    first.write('{"a": 1}')
+    second = tmpdir.join('second.json')
+    second.write('{"b": 1}')
+
+    cache = figtree.LoadCache(max_entries=2)
+    figtree.load_config(str(first), cache=cache)
+    figtree.load_config(str(second), cache=cache)
+    figtree.load_config((str(first), str(second)), cache=cache)
+
+    # least recently used goes first
+    assert_that(cache).is_length(2)
+    figtree.load_config(str(first), cache=cache)
+    assert_that(cache.hits).is_equal_to(0)
+
+    cache.invalidate('@' + str(second))
+    assert_that(cache).is_length(1)
+    figtree.load_config(str(first), cache=cache)
+    assert_that(cache.hits).is_equal_to(1)
+
+    cache.invalidate()
+    assert_that(cache).is_length(0)
+
+
+def test_reloading_config_cached(tmpdir):
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": 1}')
+
+    cache = figtree.LoadCache()
+    container = figtree.ReloadingConfig(str(path), cache=cache)
+
+    assert_that(container.reload().paths).is_empty()
+    assert_that(cache.hits).is_equal_to(1)
+    assert_that(container.config).is_equal_to({'a': 1})
+
+
+def test_load_remote_http_conditional():
+    from figtree import FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    source = FileConfigSource(url)
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET,
+                          url,
+                          body='{"a": {"b": 1}}',
+                          status=200,
+                          content_type='application/json',
+                          adding_headers={'ETag': '"v1"'})
+        first = source.load()
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, status=304)
+        second = source.load()
+
+        assert_that(requests_mock.calls[0].request.headers).contains_entry(
+            {'If-None-Match': '"v1"'})
+
+    assert_that(second).is_equal_to({'a': {'b': 1}})
+    assert_that(second).is_not_same_as(first)
+
+    # different filters are a different result
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"c": 1}', status=200,
+                          content_type='application/json')
+        assert_that(source.load(include=['c'])).is_equal_to({'c': 1})
+
+        headers = requests_mock.calls[0].request.headers
+        assert_that(headers).does_not_contain_key('If-None-Match')
+
+
+def test_refresher(tmpdir):
+    import threading
+    import time
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": {"b": 1}}')
+    missing = str(tmpdir.join('missing.json'))
+
+    refresher = figtree.Refresher(({'a': {'b': 0, 'c': 0}}, str(path)),
+                                  interval=0.05,
+                                  max_backoff=0.1)
+    target = refresher.add(missing, interval=0.01)
+    assert_that(refresher.config).is_equal_to({'a': {'b': 1, 'c': 0}})
+    assert_that(refresher.errors).contains_key(target)
+
+    changed = threading.Event()
+    seen = []
+
+    def on_change(config, paths):
+        seen.append(paths)
+        changed.set()
+    refresher.subscribe('a', on_change)
+
+    entry = [x for x in refresher._entries if x.target is target][0]
+    snapshot = refresher.config
+    with refresher:
+        path.write('{"a": {"b": 2}}')
+        assert_that(changed.wait(5)).is_true()
+
+        deadline = time.time() + 5
+        while entry.failures < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert_that(seen[0]).is_equal_to(['a.b'])
+    assert_that(refresher.config).is_equal_to({'a': {'b': 2, 'c': 0}})
+    # readers holding the old snapshot never see it change
+    assert_that(snapshot).is_equal_to({'a': {'b': 1, 'c': 0}})
+
+    # failing sources back off, up to the limit
+    assert_that(entry.failures).is_greater_than_or_equal_to(3)
+    assert_that(entry.due - time.time()).is_less_than(0.2)
+    refresher.close()
+
+
+def test_load_remote_http_stale_on_error():
+    import time
+    import requests
+    from figtree import CircuitBreaker, FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    source = FileConfigSource(
+        url, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.1))
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        assert_that(source.load()).is_equal_to({'a': 1})
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False)\
+            as requests_mock:
+        requests_mock.add(responses.GET, url, status=503)
+        requests_mock.add(responses.GET, url,
+                          body=requests.ConnectionError('refused'))
+
+        # the last good result stands in while the server fails
+        assert_that(source.load()).is_equal_to({'a': 1})
+        assert_that(source.breaker.state).is_equal_to('closed')
+        assert_that(source.load()).is_equal_to({'a': 1})
+        assert_that(source.breaker.state).is_equal_to('open')
+
+        # and the server is not asked again until the timeout passes
+        assert_that(source.load()).is_equal_to({'a': 1})
+        assert_that(requests_mock.calls).is_length(2)
+        assert_that(source.stale_hits).is_equal_to(3)
+        assert_that(source.stale_misses).is_equal_to(0)
+
+    time.sleep(0.1)
+    assert_that(source.breaker.state).is_equal_to('half-open')
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 2}', status=200,
+                          content_type='application/json')
+        assert_that(source.load()).is_equal_to({'a': 2})
+        assert_that(source.breaker.state).is_equal_to('closed')
+
+
+@pytest.mark.parametrize('error', ['TooManyRedirects',
+                                   'ContentDecodingError',
+                                   'ChunkedEncodingError'])
+def test_load_remote_http_half_open_error(error):
+    import time
+    import requests
+    from figtree import CircuitBreaker, FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    source = FileConfigSource(
+        url, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=0.05))
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url,
+                          body=requests.ConnectionError('refused'))
+        assert_that(source.load()).is_none()
+        assert_that(source.breaker.state).is_equal_to('open')
+
+    time.sleep(0.05)
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url,
+                          body=getattr(requests.exceptions, error)('broken'))
+        with pytest.raises(requests.RequestException):
+            source.load()
+
+    # the failed trial opens the breaker again instead of leaving it stuck
+    assert_that(source.breaker.state).is_equal_to('open')
+    time.sleep(0.05)
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        assert_that(source.load()).is_equal_to({'a': 1})
+        assert_that(source.breaker.state).is_equal_to('closed')
+
+
+def test_probe_remote_http_open_breaker():
+    import requests
+    from figtree import CircuitBreaker, FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    source = FileConfigSource(
+        url, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.HEAD, url,
+                          body=requests.ConnectionError('refused'))
+
+        assert_that(source.exists()).is_false()
+        assert_that(source.breaker.state).is_equal_to('open')
+
+        # an open breaker answers without asking the server
+        assert_that(source.exists()).is_false()
+        assert_that(source.fingerprint()).is_none()
+        assert_that(requests_mock.calls).is_length(1)
+
+
+def test_refresher_remote_failures(tmpdir):
+    import requests
+    import figtree
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False)\
+            as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        refresher = figtree.Refresher(interval=60)
+        target = refresher.add(url)
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url,
+                          body=requests.ConnectionError('refused'))
+        refresher.refresh()
+
+    # the failure shows, the refresher keeps its own last good result
+    assert_that(refresher.errors).contains_key(target)
+    assert_that(refresher._entries[0].failures).is_equal_to(1)
+    assert_that(refresher.config).is_equal_to({'a': 1})
+    refresher.close()
+
+
+def test_refresher_own_sources(tmpdir):
+    import time
+    import figtree
+
+    path = tmpdir.join('config.json')
+    path.write('{"a": 1}')
+    source = figtree.FileConfigSource(str(path))
+
+    with figtree.Refresher(interval=60) as refresher:
+        target = refresher.add(source)
+        failing = refresher.add(str(tmpdir.join('missing.json')))
+        for _ in range(40):
+            refresher.refresh()
+
+        # the source given is left as it was
+        assert_that(target).is_not_same_as(source)
+        assert_that(target.session).is_same_as(refresher.session)
+        assert_that(source.session).is_none()
+        assert_that(source.serve_stale).is_true()
+
+        # backing off stops growing at the limit
+        entry = [x for x in refresher._entries if x.target is failing][0]
+        assert_that(entry.due - time.time()).is_less_than_or_equal_to(
+            figtree.refresh.DEFAULT_MAX_BACKOFF * 1.1)
+
+        refresher.remove(source)
+        assert_that(refresher.config).is_empty()
+
+    # leaving the block shuts the workers down
+    assert_that(refresher._pool.apply_async).raises(
+        ValueError).when_called_with(len, ((), ))
+
+
+def test_load_remote_http_stale_new_source():
+    import requests
+    import figtree
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        assert_that(figtree.load_config(url)).is_equal_to({'a': 1})
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False)\
+            as requests_mock:
+        requests_mock.add(responses.GET, url,
+                          body=requests.ConnectionError('refused'))
+
+        # every call builds its own source, the URL is remembered anyway
+        for _ in range(10):
+            assert_that(figtree.load_config(url)).is_equal_to({'a': 1})
+        assert_that(requests_mock.calls).is_length(5)
+        assert_that(figtree.FileConfigSource(url).breaker.state).is_equal_to(
+            'open')
+
+
+def test_reloading_config_remote_failures():
+    import requests
+    import figtree
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        container = figtree.ReloadingConfig(url)
+
+    with responses.RequestsMock(assert_all_requests_are_fired=False)\
+            as requests_mock:
+        requests_mock.add(responses.GET, url,
+                          body=requests.ConnectionError('refused'))
+
+        for _ in range(10):
+            container.reload()
+        assert_that(requests_mock.calls).is_length(5)
+
+    assert_that(container.config).is_equal_to({'a': 1})
+    source = container._targets[0]
+    assert_that(source.stale_hits).is_equal_to(10)
+
+
+def test_load_remote_http_stale_miss():
+    from figtree import FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+    source = FileConfigSource(url, serve_stale=False)
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body='{"a": 1}', status=200,
+                          content_type='application/json')
+        requests_mock.add(responses.GET, url, status=500)
+        source.load()
+
+        assert_that(source.load()).is_none()
+        assert_that(source.stale_misses).is_equal_to(1)
+        assert_that(source.breaker.failures).is_equal_to(1)
+
+
+@pytest.mark.parametrize('name,body,content_type,expected',
+                         [
+                             ('config.json', b'{"a": {"b": 1}}',
+                              'application/json', {'a': {'b': 1}}),
+                             ('config.ini',
+                              u'[a]\nb = \u00e9\n'.encode('utf-16'),
+                              'text/plain', {'a': {'b': u'\u00e9'}}),
+                             ('config.ini',
+                              u'[a]\nb = \u00e9\n'.encode('latin-1'),
+                              'text/plain; charset="latin-1"',
+                              {'a': {'b': u'\u00e9'}}),
+                             ('config', u'a: \u00e9\n'.encode('utf-8'),
+                              'text/yaml; charset=utf-8',
+                              {'a': u'\u00e9'}),
+                             ('config.yml.gz', None,
+                              'application/gzip', {'a': {'b': 1}}),
+                         ])
+def test_load_remote_http_streamed(name, body, content_type, expected):
+    import gzip
+    from figtree import FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/{0:s}'.format(name)
+    if body is None:
+        body = gzip.compress(b'a:\n  b: 1\n')
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body=body, status=200,
+                          content_type=content_type)
+
+        source = FileConfigSource(url, stream=True, timeout=(1, 5))
+        assert_that(source.load()).is_equal_to(expected)
+
+        request = requests_mock.calls[0].request
+        assert_that(request.req_kwargs).contains_entry(
+            {'stream': True}, {'timeout': (1, 5)})
+
+
+@pytest.mark.xfail(raises=ValueError)
+def test_load_remote_http_too_large():
+    from figtree import FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config.json'
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body=b'{"a": "' + b'x' * 64 +
+                          b'"}', status=200, content_type='application/json')
+
+        FileConfigSource(url, max_size=64).load()
+
+
+def test_response_body_bounded():
+    import io
+    from figtree.loader import _ResponseBody
+
+    class Response(object):
+        # a chunked response does not say how long it is
+        def iter_content(self, chunk_size):
+            for _ in range(4):
+                yield b'x' * 10
+
+    body = io.BufferedReader(_ResponseBody(Response(), 'test', max_size=40))
+    assert_that(body.read()).is_length(40)
+
+    body = io.BufferedReader(_ResponseBody(Response(), 'test', max_size=35))
+    assert_that(body.read).raises(ValueError).when_called_with()
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'utf-16'])
+def test_load_json_bytes_decoded(tmpdir, monkeypatch, encoding):
+    import figtree.parsers
+    from figtree import FileConfigSource
+
+    # as on python 3.3 to 3.5, where json.loads refuses bytes
+    monkeypatch.setattr(figtree.parsers, 'JSON_TAKES_BYTES', False)
+
+    path = tmpdir.join('config.json')
+    path.write_binary(u'{"a": "\u00e9"}'.encode(encoding))
+
+    assert_that(FileConfigSource(str(path)).load()).is_equal_to(
+        {'a': u'\u00e9'})
+
+
+def test_load_json_mapped_file(tmpdir, monkeypatch):
+    import figtree.parsers
+    from figtree import FileConfigSource
+
+    def copied(data):
+        raise AssertionError('mapped file copied whole')
+
+    monkeypatch.setattr(figtree.parsers, '_as_bytes', copied)
+
+    path = tmpdir.join('config')
+    path.write_binary(b'{"a": {"b": [1, 2]}, "c": "' + b'x' * 10000 + b'"}')
+    source = FileConfigSource(str(path), hint='json',
+                              parser_options={'chunk_size': 1024})
+
+    conf = source.load()
+
+    assert_that(conf['a.b']).is_equal_to([1, 2])
+    assert_that(conf['c']).is_length(10000)
+
+
+def test_parser_sniffing_order():
+    from figtree.parsers import Parser
+
+    # stricter formats go first, ini accepts nearly anything
+    names = list(Parser._parsers)
+    assert_that(names.index('toml')).is_less_than(names.index('ini'))
+
+
+@pytest.mark.parametrize('content_type,body',
+                         [
+                             ('text/yaml; charset=iso-8859-1',
+                              u'a: \u00e9\n'.encode('latin-1')),
+                             ('application/json; charset=utf-16',
+                              u'{"a": "\u00e9"}'.encode('utf-16')),
+                             ('application/xml; charset=iso-8859-1',
+                              u'<c><a>\u00e9</a></c>'.encode('latin-1')),
+                         ])
+@pytest.mark.parametrize('stream', [False, True])
+def test_load_remote_http_declared_charset(content_type, body, stream):
+    from figtree import FileConfigSource
+
+    url = 'http://doesnotexist.localdomain/config'
+
+    with responses.RequestsMock() as requests_mock:
+        requests_mock.add(responses.GET, url, body=body, status=200,
+                          content_type=content_type)
+
+        conf = FileConfigSource(url, stream=stream).load()
+
+    assert_that(conf).is_equal_to({'a': u'\u00e9'})